@@ -15,26 +15,228 @@ short_description: HttpApi Plugin for F5 Cloud Services
 description:
   - This HttpApi plugin provides methods to connect to F5 Cloud Services over a HTTP(S)-based api.
 version_added: "2.10"
+options:
+  token_cache:
+    description:
+      - Path to a directory used to share F5 Cloud Services tokens between connections and playbook runs.
+      - Tokens are keyed by the service URL and username, only one process performs the login while others
+        wait and reuse the stored token.
+      - The directory and the token files are created readable by the owner only.
+      - When not set, every connection performs its own login.
+    type: path
+    vars:
+      - name: ansible_f5cs_token_cache
+  purge_token_cache:
+    description:
+      - When C(yes) and C(token_cache) is set, logout removes the cached token and revokes it on the service.
+      - By default, the cached token is left in place so that other connections can reuse it.
+    type: bool
+    default: no
+    vars:
+      - name: ansible_f5cs_purge_token_cache
+  connection_pool:
+    description:
+      - When C(yes), requests are sent over a pool of persistent HTTP/1.1 connections to F5 Cloud Services
+        instead of opening a new connection for every request.
+      - New connections in the pool resume the TLS session of previous ones.
+      - Certificate validation, proxy and timeout settings of the httpapi connection apply to the pool.
+    type: bool
+    default: no
+    vars:
+      - name: ansible_f5cs_connection_pool
+  connection_pool_size:
+    description:
+      - Maximum number of idle connections kept open in the pool.
+    type: int
+    default: 4
+    vars:
+      - name: ansible_f5cs_connection_pool_size
+  retries:
+    description:
+      - Number of times a request is retried when the service throttles it with a C(429) status, responds with
+        C(502), C(503) or C(504), or resets the connection.
+      - GET, PUT and DELETE requests are retried on any of these errors, other POST and PATCH requests only
+        when throttled. POST requests to C(/beacon/v1/declare) are only retried with C(retry_declare) enabled.
+      - Set to C(0) to disable retries.
+    type: int
+    default: 3
+    vars:
+      - name: ansible_f5cs_retries
+  retry_backoff:
+    description:
+      - Base delay in seconds of the exponential backoff between retries, the delay doubles after every
+        retry and includes random jitter.
+      - A C(Retry-After) header returned by the service takes precedence over the computed delay.
+    type: float
+    default: 1.0
+    vars:
+      - name: ansible_f5cs_retry_backoff
+  retry_max_backoff:
+    description:
+      - Upper bound in seconds of the computed delay between retries.
+    type: float
+    default: 30.0
+    vars:
+      - name: ansible_f5cs_retry_max_backoff
+  retry_budget:
+    description:
+      - Total time in seconds a request is allowed to spend waiting for retries, no retry is attempted
+        when the next delay would exceed it.
+    type: float
+    default: 120.0
+    vars:
+      - name: ansible_f5cs_retry_budget
+  retry_declare:
+    description:
+      - When C(yes), POST requests to C(/beacon/v1/declare) are retried like idempotent requests.
+      - Only enable it when replaying a declaration that may already have been processed is acceptable.
+    type: bool
+    default: no
+    vars:
+      - name: ansible_f5cs_retry_declare
+  response_cache_size:
+    description:
+      - Maximum number of GET responses kept for conditional requests, least recently used responses are
+        evicted first.
+      - Cached responses are revalidated with C(If-None-Match) and C(If-Modified-Since) headers, and served
+        from the cache when the service responds with C(304).
+      - Any POST, PATCH, PUT or DELETE request invalidates cached responses of the same resource path.
+      - Set to C(0) to disable the cache.
+    type: int
+    default: 32
+    vars:
+      - name: ansible_f5cs_response_cache_size
+  fact_cache_size:
+    description:
+      - Maximum number of module results, for example of C(beacon_info), kept in memory by the persistent
+        connection, least recently used results are evicted first.
+      - Modules choose which results are cached and for how long, modules changing the configuration of an
+        account drop the cached results of that account.
+      - Set to C(0) to disable the cache.
+    type: int
+    default: 16
+    vars:
+      - name: ansible_f5cs_fact_cache_size
+  max_concurrent_requests:
+    description:
+      - Maximum number of requests sent in parallel when a module sends several requests at once.
+    type: int
+    default: 4
+    vars:
+      - name: ansible_f5cs_max_concurrent_requests
+  compression:
+    description:
+      - When C(yes), responses are requested with an C(Accept-Encoding) header set to C(gzip) and transparently
+        decompressed, and request bodies larger than C(compression_threshold) are sent gzip encoded.
+      - Sizes before and after compression are written to the persistent connection log.
+    type: bool
+    default: no
+    vars:
+      - name: ansible_f5cs_compression
+  compression_threshold:
+    description:
+      - Minimum size in bytes of a request body to be compressed.
+    type: int
+    default: 1024
+    vars:
+      - name: ansible_f5cs_compression_threshold
+  json_backend:
+    description:
+      - JSON library used to encode request bodies and decode responses.
+      - With C(auto), the fastest installed library is used, C(orjson) first, then C(ujson), falling back
+        to the Python standard library.
+    type: str
+    default: auto
+    choices: ['auto', 'orjson', 'ujson', 'json']
+    vars:
+      - name: ansible_f5cs_json_backend
+  log_body_size:
+    description:
+      - Number of bytes of request bodies written to the persistent connection log, longer bodies are truncated.
+      - Values of C(password), C(access_token) and C(refresh_token) fields are always redacted.
+      - Set to C(0) to only log the body size.
+      - Messages are only built when persistent connection logging is enabled.
+    type: int
+    default: 1024
+    vars:
+      - name: ansible_f5cs_log_body_size
+  log_responses:
+    description:
+      - When C(yes), the status, duration and size of every response is written to the persistent
+        connection log.
+    type: bool
+    default: no
+    vars:
+      - name: ansible_f5cs_log_responses
+  metrics_file:
+    description:
+      - Path of a JSON file the per-endpoint request statistics are written to when the persistent
+        connection closes.
+      - Statistics hold, for every method and URL template, the call count, a latency histogram, bytes sent
+        and received and the count of every response status.
+      - Statistics can also be retrieved from modules with the C(get_metrics) connection method.
+    type: path
+    vars:
+      - name: ansible_f5cs_metrics_file
 """
 
+import gzip
+import random
 import re
+import threading
+import time
 
 from ansible.module_utils.basic import to_text
+from ansible.module_utils._text import to_bytes
 from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.six import BytesIO
 from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.error import URLError
+from ansible.module_utils.six.moves.urllib.parse import urlparse
 from ansible.plugins.httpapi import HttpApiBase
 from ansible.module_utils.connection import ConnectionError
 
-
 try:
-    import json
+    from plugins.plugin_utils.fact_cache import FactCache
+    from plugins.plugin_utils.json_backend import get_json_backend
+    from plugins.plugin_utils.metrics import RequestMetrics
+    from plugins.plugin_utils.response_cache import ResponseCache
+    from plugins.plugin_utils.token_cache import TokenCache
+    from plugins.plugin_utils.transport import ConnectionPool
+    from plugins.plugin_utils.transport import is_connection_reset
+    from plugins.plugin_utils.transport import parse_retry_after
 except ImportError:
-    import simplejson as json
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.fact_cache import FactCache
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.json_backend import get_json_backend
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.metrics import RequestMetrics
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.response_cache import ResponseCache
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.token_cache import TokenCache
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.transport import ConnectionPool
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.transport import is_connection_reset
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.transport import parse_retry_after
 
 BASE_HEADERS = {'Content-Type': 'application/json'}
 LOGIN_URL = "/v1/svc-auth/login"
 LOGOUT_URL = "/v1/svc-auth/logout"
 RELOG_URL = "/v1/svc-auth/relogin"
+AUTH_URLS = (LOGIN_URL, LOGOUT_URL, RELOG_URL)
+DECLARE_URL = "/beacon/v1/declare"
+
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+NON_IDEMPOTENT_METHODS = ('POST', 'PATCH')
+WRITE_METHODS = ('POST', 'PATCH', 'PUT', 'DELETE')
+REQUEST_METHODS = ('GET',) + WRITE_METHODS
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Values of these fields are replaced in logged request bodies, the value may be cut short by truncation.
+REDACT_RE = re.compile(
+    r'("(?:password|access_token|refresh_token|accessToken|refreshToken)"\s*:\s*)"(?:[^"\\]|\\.?)*(?:"|$)'
+)
+
+# Refresh the access token this many seconds before it is due to expire, so that a request
+# issued right at the edge of the token lifetime does not get rejected in flight.
+TOKEN_REFRESH_MARGIN = 60
 
 
 class HttpApi(HttpApiBase):
@@ -44,56 +246,218 @@ class HttpApi(HttpApiBase):
         self.access_token = None
         self.refresh_token = None
         self.token_timeout = None
+        self.token_expires_at = None
+        self.username = None
+        self.connection_pool = None
+        self._response_cache = None
+        self._fact_cache = None
+        self._json_backend = None
+        self._log_enabled = None
+        self.metrics = RequestMetrics()
+        self._auth_lock = threading.Lock()
+        self._init_lock = threading.Lock()
 
     def login(self, username, password):
-        if username and password:
-            payload = {
-                'username': username,
-                'password': password
-                }
-            response = self.send_request(LOGIN_URL, method='POST', data=payload, headers=BASE_HEADERS)
-        else:
+        if not (username and password):
             raise AnsibleConnectionFailure('Username and password are required for login.')
 
+        self.username = username
+        cache = self._get_token_cache()
+        if cache is None:
+            return self._login(username, password)
+
+        # Only one process performs the login while the others wait for the lock and reuse its token.
+        with cache.lock():
+            entry = cache.read(margin=TOKEN_REFRESH_MARGIN)
+            if entry:
+                self._log('F5 Cloud Services using cached access token')
+                return self._set_tokens(entry)
+            self._login(username, password)
+            self._store_tokens(cache)
+
+    def _login(self, username, password):
+        payload = {
+            'username': username,
+            'password': password
+        }
+        response = self.send_request(LOGIN_URL, method='POST', data=payload, headers=BASE_HEADERS)
+
         try:
             self.refresh_token = response['contents']['refresh_token']
             self.access_token = response['contents']['access_token']
-            self.token_timeout = int(response['contents']['expires_at'])
+            self._set_token_timeout(response['contents']['expires_at'])
             self.connection._auth = {'Authorization': 'Bearer {0}'.format(self.access_token)}
-        except KeyError:
+        except (KeyError, TypeError, ValueError):
             raise ConnectionError('Server returned invalid response during connection authentication.')
 
     def update_auth(self, response, response_text):
-        """We never update token per request, we will utilize token timeouts for that instead at some point,
-        for now we just return None."""
+        """We never update token per request, token expiry is tracked in send_request instead,
+        so we just return None."""
         return None
 
-    def _refresh_token(self, username):
-        """Refresh token method to be used in future implementation."""
+    def _get_connection_option(self, option, default=None):
+        try:
+            return self.connection.get_option(option)
+        except KeyError:
+            return default
+
+    def _get_connection_pool(self):
+        if self.connection_pool is not None or not self.get_option('connection_pool'):
+            return self.connection_pool
+        with self._init_lock:
+            if self.connection_pool is None:
+                self.connection_pool = ConnectionPool(
+                    self.connection._url,
+                    size=self.get_option('connection_pool_size'),
+                    timeout=self._get_connection_option('persistent_command_timeout', 30),
+                    validate_certs=self._get_connection_option('validate_certs', True),
+                    ca_path=self._get_connection_option('ca_path'),
+                    client_cert=self._get_connection_option('client_cert'),
+                    client_key=self._get_connection_option('client_key'),
+                    use_proxy=self._get_connection_option('use_proxy', True),
+                )
+        return self.connection_pool
+
+    def _get_response_cache(self):
+        if self._response_cache is not None:
+            return self._response_cache
+        size = self.get_option('response_cache_size')
+        if not size:
+            return None
+        with self._init_lock:
+            if self._response_cache is None:
+                self._response_cache = ResponseCache(size)
+        return self._response_cache
+
+    def _get_fact_cache(self):
+        if self._fact_cache is not None:
+            return self._fact_cache
+        size = self.get_option('fact_cache_size')
+        if not size:
+            return None
+        with self._init_lock:
+            if self._fact_cache is None:
+                self._fact_cache = FactCache(size)
+        return self._fact_cache
+
+    def _get_token_cache(self):
+        path = self.get_option('token_cache')
+        if not path:
+            return None
+        return TokenCache(path, self.connection._url, self.username)
+
+    def _set_tokens(self, entry):
+        self.access_token = entry['access_token']
+        self.refresh_token = entry['refresh_token']
+        self.token_expires_at = float(entry['expires_at'])
+        self.token_timeout = int(self.token_expires_at - time.time())
+        self.connection._auth = {'Authorization': 'Bearer {0}'.format(self.access_token)}
+
+    def _store_tokens(self, cache):
+        cache.write(self.access_token, self.refresh_token, self.token_expires_at)
+
+    def _set_token_timeout(self, expires_at):
+        """Store token lifetime and compute the absolute expiry time.
+
+        F5 Cloud Services returns the token lifetime in seconds, however we also accept an absolute
+        epoch timestamp should the service ever decide to return one.
+        """
+        self.token_timeout = int(expires_at)
+        if self.token_timeout > time.time():
+            self.token_expires_at = self.token_timeout
+        else:
+            self.token_expires_at = time.time() + self.token_timeout
+
+    def _token_expired(self):
+        if not self.access_token or self.token_expires_at is None:
+            return False
+        return time.time() >= self.token_expires_at - TOKEN_REFRESH_MARGIN
+
+    def _refresh_token(self, username=None):
+        """Obtain a new access token using the stored refresh token.
+
+        With the token cache enabled, a token already refreshed by another process is reused instead.
+        """
+        username = username or self.username
+        cache = self._get_token_cache()
+        if cache is None:
+            return self._relogin(username)
+
+        with cache.lock():
+            entry = cache.read(margin=TOKEN_REFRESH_MARGIN)
+            if entry and entry['access_token'] != self.access_token:
+                self._log('F5 Cloud Services using access token refreshed by another process')
+                return self._set_tokens(entry)
+            self._relogin(username)
+            self._store_tokens(cache)
+
+    def _relogin(self, username):
+        """When the service rejects the refresh token, we fall back to a full login with the
+        connection credentials."""
         payload = {
             'username': username,
             'refresh_token': self.refresh_token
         }
 
         response = self.send_request(RELOG_URL, method='POST', data=payload, headers=BASE_HEADERS)
+        if response['code'] in [400, 401, 403]:
+            self._log('F5 Cloud Services refresh token rejected, performing full login')
+            self.connection._auth = None
+            return self._login(username, self.connection.get_option('password'))
         try:
             self.access_token = response['contents']['access_token']
+            self.refresh_token = response['contents'].get('refresh_token', self.refresh_token)
+            if 'expires_at' in response['contents']:
+                self._set_token_timeout(response['contents']['expires_at'])
             self.connection._auth = {'Authorization': 'Bearer %s' % self.access_token}
-        except KeyError:
+        except (KeyError, TypeError, ValueError):
             raise ConnectionError('Server returned invalid response during connection authentication.')
 
     def logout(self):
+        try:
+            self._logout()
+        finally:
+            if self.connection_pool is not None:
+                self.connection_pool.close()
+            self._dump_metrics()
+
+    def _dump_metrics(self):
+        path = self.get_option('metrics_file')
+        if not path:
+            return
+        try:
+            self.metrics.dump(path)
+        except (IOError, OSError) as ex:
+            self._log('F5 Cloud Services could not write request metrics to {0}: {1}', path, ex)
+
+    def _logout(self):
         if not self.connection._auth:
             return
         if not self.access_token:
             raise AnsibleConnectionFailure('Access token not found, could not perform logout operation.')
 
+        cache = self._get_token_cache()
+        if cache is not None:
+            if not self.get_option('purge_token_cache'):
+                # Other connections may still be using the cached token, so we must not revoke it.
+                return
+            with cache.lock():
+                cache.delete()
+
         payload = {
             'access_token': self.access_token
         }
         self.send_request(LOGOUT_URL, method='POST', data=payload, headers=BASE_HEADERS)
 
     def handle_httperror(self, exc):
+        if exc.code in RETRY_STATUS_CODES:
+            # Transient errors are passed back to send_request which retries them, and raises
+            # once retries are exhausted.
+            return False
+        self._raise_for_server_error(exc)
+        return False
+
+    def _raise_for_server_error(self, exc):
         err_5xx = r'^5\d{2}$'
         # We raise AnsibleConnectionFailure without passing to the module, as 50x type errors indicate a problem
         # with the service, anything else will be handled by the caller
@@ -101,36 +465,312 @@ class HttpApi(HttpApiBase):
         handled_error = re.search(err_5xx, str(exc.code))
         if handled_error:
             raise AnsibleConnectionFailure('Could not connect to {0}: {1}'.format(self.connection._url, exc.reason))
-        return False
 
     def send_request(self, url, method=None, **kwargs):
         body = kwargs.pop('data', None)
-        data = json.dumps(body) if body else None
+        data = self._get_json_backend().dumps(body) if body else None
+        self._display_request(method, url, data)
+        if self.get_option('compression'):
+            data = self._compress_request(url, data, kwargs)
+        can_refresh = url not in AUTH_URLS and self.refresh_token is not None
+
+        if can_refresh and self._token_expired():
+            with self._auth_lock:
+                # Concurrent requests might have refreshed the token while we were waiting for the lock
+                if self._token_expired():
+                    self._refresh_token()
+
+        token = self.access_token
+        response = self._send(url, data, method=method, **kwargs)
+        if response['code'] == 401 and can_refresh:
+            # Token might have been revoked or expired earlier than advertised, refresh it once and replay.
+            with self._auth_lock:
+                if self.access_token == token:
+                    self._refresh_token()
+            response = self._send(url, data, method=method, **kwargs)
+
+        cache = self._get_response_cache()
+        if cache is not None and method in WRITE_METHODS:
+            cache.invalidate(url)
+        return response
+
+    def send_requests(self, requests, max_workers=None):
+        """Send several requests concurrently and return their responses in the same order.
+
+        Each request is a dict with the ``method``, ``url``, and optional ``data`` and ``account_id`` keys.
+        Responses have the same ``dict(code=..., contents=...)`` shape as ``send_request``, connection
+        failures of individual requests are reported with a ``None`` code instead of being raised, so
+        one failing request does not discard the responses of the others.
+        """
+        for request in requests:
+            if (request.get('method') or 'GET').upper() not in REQUEST_METHODS:
+                raise ConnectionError('Unsupported request method: {0}'.format(request.get('method')))
+        if not requests:
+            return []
+
+        workers = min(max_workers or self.get_option('max_concurrent_requests'), len(requests))
+        if workers <= 1:
+            return [self._send_request_spec(request) for request in requests]
+        # Imported here, so single requests also work where concurrent.futures is not available.
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._send_request_spec, requests))
+
+    def _send_request_spec(self, request):
+        method = (request.get('method') or 'GET').upper()
+        kwargs = dict(account_id=request.get('account_id'))
+        if method not in ('GET', 'DELETE'):
+            kwargs['data'] = request.get('data')
+        try:
+            return getattr(self, method.lower())(request['url'], **kwargs)
+        except (AnsibleConnectionFailure, ConnectionError) as ex:
+            return dict(code=None, contents=to_text(ex))
+
+    def _send(self, url, data, method=None, **kwargs):
+        cache = self._get_response_cache() if method == 'GET' else None
+        entry = None
+        if cache is not None:
+            account_id = (kwargs.get('headers') or {}).get('X-F5aaS-Preferred-Account-Id')
+            entry = cache.get(url, account_id)
+            if entry is not None:
+                headers = dict(kwargs['headers'])
+                headers.update(cache.validators(entry))
+                kwargs['headers'] = headers
 
+        start = time.time()
+        sent = len(data) if data else 0
         try:
-            self._display_request(method=method, data=data)
-            response, response_data = self.connection.send(url, data, method=method, **kwargs)
+            response, response_data = self._send_with_retries(url, data, method=method, **kwargs)
+            if response.getcode() == 304 and entry is not None:
+                self._record_response(method, url, 304, start, sent, 0)
+                return self._cached_response(method, url, entry)
 
             response_value = self._get_response_value(response_data)
-            return dict(code=response.getcode(), contents=self._response_to_json(response_value))
+            self._record_response(method, url, response.getcode(), start, sent, len(response_value))
+            contents = self._response_to_json(response_value)
+            if cache is not None and response.getcode() == 200:
+                cache.store(url, account_id, getattr(response, 'headers', None), contents)
+            return dict(code=response.getcode(), contents=contents)
 
         except HTTPError as e:
-            return dict(code=e.code, contents=json.loads(e.read()))
+            response_value = self._decompress_response(e.read())
+            self._record_response(method, url, e.code, start, sent, len(response_value))
+            if e.code == 304 and entry is not None:
+                return self._cached_response(method, url, entry)
+            return dict(code=e.code, contents=self._response_to_json(response_value))
+        except Exception:
+            self._record_response(method, url, 'error', start, sent, 0)
+            raise
+
+    def _record_response(self, method, url, code, start, sent, received):
+        duration = time.time() - start
+        self.metrics.record(method, url, code, duration, sent, received)
+        if self._logging_enabled() and self.get_option('log_responses'):
+            self.connection._log_messages(
+                'F5 Cloud Services API Call: {0} {1} returned {2} in {3:.3f}s with {4} bytes'.format(
+                    method, url, code, duration, received
+                )
+            )
+
+    def get_identity(self):
+        """Return the service URL and username of the connection, modules use it to keep local state
+        of different logins apart.
+        """
+        username = self._get_connection_option('remote_user') or self.username
+        return '{0} {1}'.format(self.connection._url, username)
+
+    def get_metrics(self, reset=False):
+        """Return per-endpoint request statistics collected since the connection was opened.
+
+        Calls are grouped by method and URL template, see ``RequestMetrics`` for the snapshot format.
+        With ``reset``, statistics are cleared after being returned.
+        """
+        return self.metrics.snapshot(reset=reset)
+
+    def get_cached_facts(self, key, account_id=None):
+        """Return the module result cached under ``key`` for ``account_id``, or None."""
+        cache = self._get_fact_cache()
+        if cache is None:
+            return None
+        return cache.get(key, account_id)
+
+    def cache_facts(self, key, facts, ttl, account_id=None):
+        """Keep a module result for ``ttl`` seconds, see ``get_cached_facts``."""
+        cache = self._get_fact_cache()
+        if cache is not None:
+            cache.store(key, facts, ttl, account_id)
+
+    def invalidate_facts(self, account_id=None):
+        """Drop the cached module results of ``account_id``, or all of them when no account is given."""
+        cache = self._get_fact_cache()
+        if cache is not None:
+            cache.invalidate(account_id)
+
+    def _compress_request(self, url, data, kwargs):
+        """Ask for compressed responses and gzip request bodies above the configured threshold."""
+        headers = dict(kwargs.get('headers') or {})
+        headers['Accept-Encoding'] = 'gzip'
+        kwargs['headers'] = headers
+        if not data or len(data) < self.get_option('compression_threshold'):
+            return data
+
+        raw = to_bytes(data)
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as f:
+            f.write(raw)
+        compressed = buf.getvalue()
+        headers['Content-Encoding'] = 'gzip'
+        self._log(
+            'F5 Cloud Services API Call: {0} request body compressed from {1} to {2} bytes', url, len(raw), len(compressed)
+        )
+        return compressed
+
+    def _decompress_response(self, value):
+        # JSON documents never start with the gzip magic number, so it is safe to detect compressed bodies
+        # this way, even when the transport has already decompressed them.
+        if not isinstance(value, (bytes, memoryview)) or value[:2] != GZIP_MAGIC:
+            return value
+        decompressed = gzip.GzipFile(fileobj=BytesIO(value), mode='rb').read()
+        self._log(
+            'F5 Cloud Services API Call: response body decompressed from {0} to {1} bytes', len(value), len(decompressed)
+        )
+        return decompressed
+
+    def _cached_response(self, method, url, entry):
+        self._log('F5 Cloud Services API Call: {0} {1} not modified, using cached response', method, url)
+        return dict(code=200, contents=entry['contents'])
+
+    def _send_with_retries(self, url, data, method=None, **kwargs):
+        start = time.time()
+        attempt = 0
+
+        while True:
+            try:
+                return self._transport_send(url, data, method=method, **kwargs)
+            except HTTPError as exc:
+                retryable = exc.code in RETRY_STATUS_CODES and self._can_retry(url, method, exc.code)
+                retry_after = parse_retry_after(exc.headers.get('Retry-After') if exc.headers else None)
+                delay = self._backoff_delay(attempt) if retry_after is None else retry_after
+                if not self._wait_for_retry(url, method, 'status {0}'.format(exc.code), retryable, attempt, delay, start):
+                    if exc.code in RETRY_STATUS_CODES:
+                        # Deferred by handle_httperror until retries were exhausted
+                        self._raise_for_server_error(exc)
+                    raise
+            except (AnsibleConnectionFailure, EnvironmentError) as exc:
+                retryable = is_connection_reset(exc) and self._can_retry(url, method, None)
+                delay = self._backoff_delay(attempt)
+                if not self._wait_for_retry(url, method, 'connection reset', retryable, attempt, delay, start):
+                    raise
+            attempt += 1
+
+    def _wait_for_retry(self, url, method, error, retryable, attempt, delay, start):
+        retries = self.get_option('retries')
+        budget = self.get_option('retry_budget')
+        if not retryable or attempt >= retries:
+            return False
+        if time.time() - start + delay > budget:
+            self._log(
+                'F5 Cloud Services API Call: {0} {1} failed with {2}, retry budget of {3}s exhausted',
+                method, url, error, budget
+            )
+            return False
+        self._log(
+            'F5 Cloud Services API Call: {0} {1} failed with {2}, retry {3}/{4} in {5:.2f}s',
+            method, url, error, attempt + 1, retries, delay
+        )
+        time.sleep(delay)
+        return True
+
+    def _can_retry(self, url, method, code):
+        """Idempotent requests are retried on any transient error.
+
+        Other POST and PATCH requests are only retried when throttled, as the service did not process them.
+        POST requests to the declare endpoint are only retried when explicitly enabled.
+        """
+        if method in NON_IDEMPOTENT_METHODS and url not in AUTH_URLS:
+            if urlparse(url).path == DECLARE_URL:
+                return self.get_option('retry_declare')
+            return code == 429
+        return True
 
-    def _display_request(self, method, data):
+    def _backoff_delay(self, attempt):
+        base = self.get_option('retry_backoff')
+        cap = self.get_option('retry_max_backoff')
+        delay = min(cap, base * 2 ** attempt)
+        # Spread retries of concurrent clients, while keeping at least half of the exponential delay.
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _transport_send(self, url, data, method=None, **kwargs):
+        pool = self._get_connection_pool()
+        if pool is None:
+            return self.connection.send(url, data, method=method, **kwargs)
+
+        headers = dict(kwargs.get('headers') or {})
+        if self.connection._auth:
+            headers.update(self.connection._auth)
+        try:
+            return pool.send(url, data, method=method, headers=headers)
+        except HTTPError as exc:
+            # Keep the same error semantics as the httpapi connection, 5xx errors are raised from here.
+            self.handle_httperror(exc)
+            raise
+        except URLError as exc:
+            raise AnsibleConnectionFailure('Could not connect to {0}: {1}'.format(self.connection._url + url, exc.reason))
+
+    def _logging_enabled(self):
+        if self._log_enabled is None:
+            self._log_enabled = bool(self._get_connection_option('persistent_log_messages', False))
+        return self._log_enabled
+
+    def _log(self, message, *args):
+        """Write to the persistent connection log, the message is only formatted when logging is enabled."""
+        if self._logging_enabled():
+            self.connection._log_messages(message.format(*args))
+
+    def _display_request(self, method, url, data):
+        if not self._logging_enabled():
+            return
         self.connection._log_messages(
-            'F5 Cloud Services API Call: {0} {1} with data {2}'.format(method, self.connection._url, data)
+            'F5 Cloud Services API Call: {0} {1}{2} with data {3}'.format(
+                method, self.connection._url, url, self._body_preview(data)
+            )
         )
 
+    def _body_preview(self, data):
+        """Truncate the request body to the configured preview size and redact credentials."""
+        if data is None:
+            return None
+        size = self.get_option('log_body_size')
+        if not size:
+            return '<{0} bytes>'.format(len(data))
+        preview = to_text(data[:size], errors='surrogate_then_replace')
+        preview = REDACT_RE.sub(r'\1"********"', preview)
+        if len(data) > size:
+            preview += '... <{0} bytes>'.format(len(data))
+        return preview
+
     def _get_response_value(self, response_data):
-        return to_text(response_data.getvalue())
+        # Decode straight from a view of the response buffer, instead of copying it into text first.
+        if hasattr(response_data, 'getbuffer'):
+            return self._decompress_response(response_data.getbuffer())
+        return self._decompress_response(response_data.getvalue())
 
-    def _response_to_json(self, response_text):
+    def _response_to_json(self, response_value):
         try:
-            return json.loads(response_text) if response_text else {}
+            return self._get_json_backend().loads(response_value) if response_value else {}
         # JSONDecodeError only available on Python 3.5+
         except ValueError:
-            raise ConnectionError('Invalid JSON response: %s' % response_text)
+            if isinstance(response_value, memoryview):
+                response_value = response_value.tobytes()
+            raise ConnectionError('Invalid JSON response: %s' % to_text(response_value))
+
+    def _get_json_backend(self):
+        if self._json_backend is None:
+            try:
+                self._json_backend = get_json_backend(self.get_option('json_backend'))
+            except ValueError as ex:
+                raise AnsibleConnectionFailure(str(ex))
+        return self._json_backend
 
     def delete(self, url, account_id=None, **kwargs):
         if account_id:
@@ -1,10 +1,16 @@
 
 
+import random
+import time
+
 from ansible.module_utils.six import iteritems
 from ansible.module_utils.parsing.convert_bool import BOOLEANS_TRUE
 from ansible.module_utils.parsing.convert_bool import BOOLEANS_FALSE
 from collections import defaultdict
 
+# Delay in seconds before the second poll of a task, doubled after every poll.
+FIRST_POLL_DELAY = 0.5
+
 
 def is_empty_list(seq):
     if len(seq) == 1:
@@ -25,6 +31,11 @@ def flatten_boolean(value):
 
 
 class AnsibleF5Parameters(object):
+    # Per class tables mapping API keys to the attribute they are stored in, and whether that attribute
+    # has a property setter. They are filled as keys are first seen, see ``_dispatch_table``.
+    _dispatch_tables = {}
+    _api_attribute_tables = {}
+
     def __init__(self, *args, **kwargs):
         self._values = defaultdict(lambda: None)
         self._values['__warnings'] = []
@@ -34,50 +45,142 @@ class AnsibleF5Parameters(object):
         params = kwargs.pop('params', None)
         if params:
             self.update(params=params)
-            self._params.update(params)
+
+    @classmethod
+    def _dispatch_table(cls):
+        table = cls._dispatch_tables.get(cls)
+        if table is None:
+            table = cls._dispatch_tables[cls] = {}
+        return table
+
+    @classmethod
+    def _add_dispatch(cls, key):
+        api_map = getattr(cls, 'api_map', None)
+        if api_map is not None and key in api_map:
+            map_key = api_map[key]
+        else:
+            map_key = key
+        # Handle weird API parameters like `dns.proxy.__iter__` by
+        # using a map provided by the module developer
+        class_attr = getattr(cls, map_key, None)
+        # Mapped values which are a @property with a setter are set through it,
+        # everything else is stored as is
+        use_setter = isinstance(class_attr, property) and class_attr.fset is not None
+        entry = cls._dispatch_table()[key] = (map_key, use_setter)
+        return entry
+
+    @classmethod
+    def _api_attribute_pairs(cls):
+        pairs = cls._api_attribute_tables.get(cls)
+        if pairs is None:
+            api_map = getattr(cls, 'api_map', None) or {}
+            pairs = cls._api_attribute_tables[cls] = [
+                (api_attribute, api_map.get(api_attribute, api_attribute)) for api_attribute in cls.api_attributes
+            ]
+        return pairs
 
     def update(self, params=None):
         if params:
             self._params.update(params)
+            table = self._dispatch_table()
             for k, v in iteritems(params):
-                if self.api_map is not None and k in self.api_map:
-                    map_key = self.api_map[k]
-                else:
-                    map_key = k
-                # Handle weird API parameters like `dns.proxy.__iter__` by
-                # using a map provided by the module developer
-                class_attr = getattr(type(self), map_key, None)
-                if isinstance(class_attr, property):
-                    # There is a mapped value for the api_map key
-                    if class_attr.fset is None:
-                        # If the mapped value does not have
-                        # an associated setter
-                        self._values[map_key] = v
-                    else:
-                        # The mapped value has a setter
-                        setattr(self, map_key, v)
+                entry = table.get(k)
+                if entry is None:
+                    entry = self._add_dispatch(k)
+                map_key, use_setter = entry
+                if use_setter:
+                    setattr(self, map_key, v)
                 else:
-                    # If the mapped value is not a @property
                     self._values[map_key] = v
 
     def api_params(self):
         result = {}
-        for api_attribute in self.api_attributes:
-            if self.api_map is not None and api_attribute in self.api_map:
-                result[api_attribute] = getattr(self, self.api_map[api_attribute])
-            else:
-                result[api_attribute] = getattr(self, api_attribute)
+        for api_attribute, attribute in self._api_attribute_pairs():
+            result[api_attribute] = getattr(self, attribute)
         result = self._filter_params(result)
         return result
 
     def __getattr__(self, item):
         # Ensures that properties that weren't defined, and therefore stashed
-        # in the `_values` dict, will be retrievable.
-        return self._values[item]
+        # in the `_values` dict, will be retrievable. Missing values are not
+        # added to `_values`, so probing an object does not grow it.
+        return self._values.get(item)
 
     def _filter_params(self, params):
         return dict((k, v) for k, v in iteritems(params) if v is not None)
 
 
+class FieldMapper(object):
+    """Convert raw API resources straight into the values ``to_return`` of a parameters class returns.
+
+    The API names of the returnables are resolved once from the ``api_map`` of the class, so converting
+    a resource is a few dictionary lookups instead of building a parameters object. Properties of the
+    class may transform values, so when returnables or mapped attributes are properties, the mapper
+    falls back to the parameters object and the result is always the same.
+    """
+    _mappers = {}
+
+    def __init__(self, parameters_class, returnables=None):
+        self.parameters_class = parameters_class
+        self.returnables = list(returnables or parameters_class.returnables)
+        api_map = getattr(parameters_class, 'api_map', None) or {}
+        api_names = dict((v, k) for k, v in iteritems(api_map))
+        self.fields = tuple(
+            (returnable, api_names.get(returnable, returnable)) for returnable in self.returnables
+        )
+        self.compiled = not any(
+            isinstance(getattr(parameters_class, x, None), property)
+            for x in set(self.returnables) | set(api_map.values())
+        )
+
+    @classmethod
+    def for_class(cls, parameters_class, returnables=None):
+        key = (parameters_class, tuple(returnables or ()))
+        mapper = cls._mappers.get(key)
+        if mapper is None:
+            mapper = cls._mappers[key] = cls(parameters_class, returnables)
+        return mapper
+
+    def __call__(self, resource):
+        if not self.compiled:
+            params = self.parameters_class(params=resource)
+            result = dict((x, getattr(params, x)) for x in self.returnables)
+            return params._filter_params(result)
+        result = {}
+        for returnable, api_name in self.fields:
+            value = resource.get(api_name)
+            if value is None and api_name != returnable:
+                value = resource.get(returnable)
+            if value is not None:
+                result[returnable] = value
+        return result
+
+
+class PollBackoff(object):
+    """Exponential backoff with jitter between the polls of tasks, bounded by a deadline.
+
+    The delay starts at ``FIRST_POLL_DELAY`` and doubles after every poll up to ``max_delay``. Half of
+    it is kept and the other half is random, and the last sleep never goes past the deadline.
+    """
+    def __init__(self, timeout, max_delay):
+        self.start = time.time()
+        self.deadline = self.start + timeout
+        self.max_delay = max_delay
+        self.delay = min(FIRST_POLL_DELAY, max_delay)
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    def sleep(self):
+        """Wait before the next poll, return False without waiting once the deadline has passed."""
+        remaining = self.deadline - time.time()
+        if remaining <= 0:
+            return False
+        time.sleep(min(self.delay / 2 + random.uniform(0, self.delay / 2), remaining))
+        self.delay = min(self.delay * 2, self.max_delay)
+        return True
+
+
 class F5CollectionError(Exception):
     pass
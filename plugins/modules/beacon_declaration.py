@@ -24,31 +24,121 @@ options:
     description:
       - Full declaration of the service.
       - The declaration must start with an B(declaration) array otherwise the operation will fail.
-      - The module as it is is not idempotent until the target API is fixed to provide means to do so.
+      - With C(state=present) the declaration is only deployed when it differs from the current one.
+        Both are compared regardless of the order of keys and of applications and components, ignoring
+        empty values, which are the defaults of the service, and values computed by the service like
+        C(rollupHealthStatusId).
+      - The whole declaration is always deployed, as the service replaces the current declaration with
+        the deployed one. In diff mode, the applications and components which are added, removed or
+        changed by the deployment are reported.
     type: raw
     required: True
+  force:
+    description:
+      - When C(yes), the declaration is deployed even when it matches the current one or C(fingerprint_cache).
+    type: bool
+    default: no
+    version_added: "f5_beacon 1.1"
+  fingerprint_cache:
+    description:
+      - Directory keeping, for each login and account, a hash of the last declaration deployed or found
+        to be live.
+      - When the hash of C(content) matches a hash stored less than C(fingerprint_ttl) seconds ago, neither
+        the current declaration is read nor C(content) deployed.
+      - Declarations changed outside of this module are only noticed once the stored hash is older than
+        C(fingerprint_ttl).
+    type: path
+    version_added: "f5_beacon 1.1"
+  fingerprint_ttl:
+    description:
+      - Number of seconds a hash stored in C(fingerprint_cache) is trusted.
+    type: int
+    default: 3600
+    version_added: "f5_beacon 1.1"
+  wait:
+    description:
+      - When C(no), the references of the deployment or removal tasks are returned as soon as the tasks
+        are created, instead of waiting for them to complete. Use M(beacon_task_wait) to wait for the
+        tasks of several deployments at once.
+      - The declaration is not stored in C(fingerprint_cache) until it is found live by a later run.
+    type: bool
+    default: yes
+    version_added: "f5_beacon 1.1"
+  timeout:
+    description:
+      - Number of seconds to wait for the deployment or removal task to complete.
+      - The task status is polled with an exponential backoff, starting at half a second and doubling up
+        to C(poll_interval) between polls.
+    type: int
+    default: 300
+    version_added: "f5_beacon 1.1"
+  poll_interval:
+    description:
+      - Maximum number of seconds between two polls of the task status.
+    type: float
+    default: 10
+    version_added: "f5_beacon 1.1"
 extends_documentation_fragment: f5networks.f5_beacon.f5cs
 author:
   - Wojciech Wypior (@wojtek0806)
 '''
 
 EXAMPLES = r'''
+- name: Start the deployments on every account
+  beacon_declaration:
+    content: "{{ lookup('file', 'decl.json') }}"
+    preferred_account_id: "{{ item }}"
+    wait: no
+  loop: "{{ account_ids }}"
+  register: deployments
+
+- name: Wait for all deployments to complete
+  beacon_task_wait:
+    tasks: "{{ deployments.results | map(attribute='task_references') | select('defined') | flatten }}"
 '''
 
 RETURN = r'''
+task_references:
+  description:
+    - Tasks deploying or removing the declaration, returned instead of waiting for them when wait is no.
+  returned: changed and wait is no
+  type: list
+  sample: [{"task_reference": "/beacon/v1/task/5d2e1b0c", "preferred_account_id": "a-aaQsw6MlaD"}]
+polls:
+  description:
+    - Number of times the task status was requested.
+    - Includes the polls of the task reading the current declaration, so it is also returned when nothing changed.
+  returned: when a task was polled
+  type: int
+  sample: 4
+elapsed:
+  description: Number of seconds spent waiting for the tasks to complete.
+  returned: when a task was polled
+  type: float
+  sample: 3.52
 '''
 
+import errno
+import hashlib
+import os
+import tempfile
+import time
+
+from ansible.module_utils._text import to_bytes
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import Connection
 from ansible.module_utils.urls import urlparse
+from ansible.module_utils.six import iteritems
 from ansible.module_utils.six import string_types
 
 try:
     from plugins.module_utils.common import AnsibleF5Parameters
     from plugins.module_utils.common import F5CollectionError
+    from plugins.module_utils.common import PollBackoff
 except ImportError:
     from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import AnsibleF5Parameters
     from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import F5CollectionError
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import PollBackoff
 
 try:
     import json
@@ -56,6 +146,203 @@ except ImportError:
     import simplejson as json
 
 
+INVALID_CONTENT = (
+    "The provided 'declaration' could not be converted into valid json. If you "
+    "are using the 'to_nice_json' filter, please remove it."
+)
+
+# Keys of a declaration computed by the service, they are ignored when comparing declarations.
+SERVER_KEYS = frozenset(['rollupHealthStatusId'])
+
+
+def item_name(item):
+    """Return the name of a declared application or component, or None."""
+    if not isinstance(item, dict):
+        return None
+    if 'name' in item:
+        return item['name']
+    application = item.get('application')
+    if isinstance(application, dict):
+        return application.get('name')
+    return None
+
+
+def is_default(value):
+    return value is None or value is False or value == '' or value == {} or value == []
+
+
+def normalize(value):
+    """Return a declaration, or a part of it, in a form which compares equal to the same declaration
+    returned by the service.
+
+    Empty values and keys computed by the service are removed, metadata keys are lower cased and
+    lists of applications or components are sorted by name.
+    """
+    if isinstance(value, dict):
+        result = {}
+        for k, v in iteritems(value):
+            if k in SERVER_KEYS:
+                continue
+            v = normalize(v)
+            if is_default(v):
+                continue
+            if k == 'metadata' and isinstance(v, dict):
+                v = dict((x.lower(), y) for x, y in iteritems(v))
+            result[k] = v
+        return result
+    if isinstance(value, list):
+        result = [normalize(x) for x in value]
+        names = [item_name(x) for x in value]
+        if result and all(isinstance(x, string_types) for x in names):
+            result = [x for name, x in sorted(zip(names, result), key=lambda k: k[0])]
+        return result
+    return value
+
+
+def fingerprint(declaration):
+    """Return the SHA-256 hash of the canonical JSON form of a normalized declaration.
+
+    The JSON document is hashed while it is encoded, so large declarations are never held in memory
+    as a single string.
+    """
+    digest = hashlib.sha256()
+    encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+    chunks = []
+    size = 0
+    for chunk in encoder.iterencode(normalize(declaration)):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= 65536:
+            digest.update(to_bytes(''.join(chunks)))
+            chunks = []
+            size = 0
+    digest.update(to_bytes(''.join(chunks)))
+    return digest.hexdigest()
+
+
+class Subtree(object):
+    """Hashes of a normalized declaration part.
+
+    ``digest`` covers the whole part, ``shell`` only the values which are not in a named application or
+    component. ``children`` maps the names of the applications or components directly below the part
+    to their own Subtree, it is None when the names are not unique.
+    """
+    __slots__ = ('digest', 'shell', 'children')
+
+    def __init__(self, digest, shell, children):
+        self.digest = digest
+        self.shell = shell
+        self.children = children
+
+
+def subtree(value):
+    """Return the Subtree of a normalized declaration part, every node is hashed exactly once."""
+    if isinstance(value, dict):
+        digest = hashlib.sha256(b'{')
+        shell = hashlib.sha256(b'{')
+        children = {}
+        for key in sorted(value):
+            child = subtree(value[key])
+            digest.update(to_bytes(json.dumps(key)) + child.digest)
+            shell.update(to_bytes(json.dumps(key)) + child.shell)
+            if children is None or child.children is None:
+                children = None
+            elif not any(x in children for x in child.children):
+                children.update(child.children)
+            else:
+                children = None
+        return Subtree(digest.digest(), shell.digest(), children)
+    if isinstance(value, list):
+        digest = hashlib.sha256(b'[')
+        items = [subtree(x) for x in value]
+        for item in items:
+            digest.update(item.digest)
+        names = [item_name(x) for x in value]
+        if not all(isinstance(x, string_types) for x in names):
+            # Other lists are values of their parent like any other.
+            return Subtree(digest.digest(), digest.digest(), {})
+        if len(set(names)) != len(names):
+            return Subtree(digest.digest(), digest.digest(), None)
+        # Named items are compared by name, the list itself only records that they are there.
+        return Subtree(digest.digest(), hashlib.sha256(b'named').digest(), dict(zip(names, items)))
+    encoded = hashlib.sha256(to_bytes(json.dumps(value, sort_keys=True))).digest()
+    return Subtree(encoded, encoded, {})
+
+
+def diff_trees(want, have, path=()):
+    """Return the ``(action, path)`` changes turning the ``have`` Subtree into the ``want`` one.
+
+    Matching subtrees are skipped by comparing their digests, so the cost only depends on the size of
+    the changed parts. A part whose children cannot be matched by name is reported as changed.
+    """
+    if want.digest == have.digest:
+        return []
+    if want.children is None or have.children is None:
+        return [('changed', path)]
+    result = []
+    if want.shell != have.shell:
+        result.append(('changed', path))
+    for name, child in iteritems(want.children):
+        other = have.children.get(name)
+        if other is None:
+            result.append(('added', path + (name,)))
+        else:
+            result.extend(diff_trees(child, other, path + (name,)))
+    for name in have.children:
+        if name not in want.children:
+            result.append(('removed', path + (name,)))
+    return result
+
+
+class FingerprintStore(object):
+    """On-disk store of the fingerprint of the last declaration known to be live on each account.
+
+    Entries are keyed by the ``identity`` of the connection as well, as the default account of
+    different logins differs.
+    """
+    def __init__(self, path, identity=''):
+        self.path = os.path.expanduser(path)
+        self.identity = identity
+
+    def _filename(self, account_id):
+        key = hashlib.sha256(to_bytes('{0}\n{1}'.format(self.identity, account_id or ''))).hexdigest()
+        return os.path.join(self.path, key + '.json')
+
+    def read(self, account_id, ttl):
+        """Return the stored fingerprint, or None when it is missing, unreadable or older than ``ttl``."""
+        try:
+            with open(self._filename(account_id), 'r') as f:
+                entry = json.load(f)
+            if float(entry['time']) + ttl <= time.time():
+                return None
+            return entry['fingerprint']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def write(self, account_id, value):
+        try:
+            os.makedirs(self.path, 0o700)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dict(fingerprint=value, time=time.time()), f)
+            os.rename(tmp, self._filename(account_id))
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def delete(self, account_id):
+        try:
+            os.unlink(self._filename(account_id))
+        except OSError as ex:
+            if ex.errno != errno.ENOENT:
+                raise
+
+
 class Parameters(AnsibleF5Parameters):
     api_map = {
     }
@@ -68,6 +355,14 @@ class Parameters(AnsibleF5Parameters):
     ]
 
 
+class ApiParameters(Parameters):
+    @property
+    def declaration(self):
+        if self._values['content'] is None:
+            return None
+        return self._values['content'].get('declaration')
+
+
 class ModuleParameters(Parameters):
     @property
     def content(self):
@@ -79,6 +374,13 @@ class ModuleParameters(Parameters):
         else:
             return self._values['content']
 
+    @property
+    def declaration(self):
+        content = self.content
+        if not isinstance(content, dict):
+            return None
+        return content.get('declaration')
+
 
 class Changes(Parameters):
     def to_return(self):
@@ -125,6 +427,13 @@ class Difference(object):
         except AttributeError:
             return attr1
 
+    @property
+    def content(self):
+        if self.have is None or self.have.declaration is None:
+            return self.want.content
+        if normalize(self.want.declaration) != normalize(self.have.declaration):
+            return self.want.content
+
 
 class ModuleManager(object):
     def __init__(self, *args, **kwargs):
@@ -132,7 +441,25 @@ class ModuleManager(object):
         self.client = kwargs.pop('client', None)
         self.url = '/beacon/v1/declare'
         self.want = ModuleParameters(params=self.module.params)
+        self.parse_content()
+        self.have = None
+        self.store = None
+        if self.want.fingerprint_cache:
+            self.store = FingerprintStore(self.want.fingerprint_cache, self.client.get_identity())
+        self._fingerprint = None
+        self.diff = None
         self.changes = UsableChanges()
+        self.task_references = []
+        self.polls = 0
+        self.elapsed = 0.0
+
+    def parse_content(self):
+        """Decode ``content`` once, so an invalid declaration is reported before any request is sent."""
+        try:
+            content = self.want.content
+        except ValueError:
+            raise F5CollectionError(INVALID_CONTENT)
+        self.want.update(dict(content=content))
 
     def _announce_deprecations(self, result):
         warnings = result.pop('__warnings', [])
@@ -164,11 +491,46 @@ class ModuleManager(object):
         changes = reportable.to_return()
         result.update(**changes)
         result.update(dict(changed=changed))
+        if self.diff is not None:
+            result.update(dict(diff=dict(prepared=self.diff)))
+        if self.task_references:
+            result.update(dict(task_references=self.task_references))
+        if self.polls:
+            result.update(dict(polls=self.polls, elapsed=round(self.elapsed, 2)))
         self._announce_deprecations(result)
         return result
 
     def present(self):
-        return self.create()
+        if self.want.force:
+            return self.deploy()
+        if self.store is not None:
+            value = self.get_fingerprint()
+            if self.store.read(self.want.preferred_account_id, self.want.fingerprint_ttl) == value:
+                return False
+        self.have = self.read_current_from_device()
+        if not self.should_update():
+            self.remember()
+            return False
+        return self.deploy()
+
+    def deploy(self):
+        changed = self.create()
+        if not self.module.check_mode and self.want.wait:
+            self.remember()
+        return changed
+
+    def remember(self):
+        if self.store is not None:
+            self.store.write(self.want.preferred_account_id, self.get_fingerprint())
+
+    def get_fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.want.declaration)
+        return self._fingerprint
+
+    def should_update(self):
+        diff = Difference(self.want, self.have)
+        return diff.compare('content') is not None
 
     def absent(self):
         return self.remove()
@@ -176,27 +538,67 @@ class ModuleManager(object):
     def remove(self):
         if self.module.check_mode:
             return True
+        if self.store is not None:
+            self.store.delete(self.want.preferred_account_id)
         self.remove_from_device()
         return True
 
     def create(self):
         self._set_changed_options()
+        if self.module._diff and self.have is not None:
+            self.diff = self.get_diff()
         if self.module.check_mode:
             return True
         self.create_on_device()
         return True
 
+    def get_diff(self):
+        """Describe the added (+), removed (-) and changed (~) applications and components, one per line."""
+        want = subtree(normalize(self.want.declaration or []))
+        have = subtree(normalize(self.have.declaration or []))
+        symbols = dict(added='+', removed='-', changed='~')
+        lines = [
+            '{0} {1}'.format(symbols[action], '/'.join(path) or '(declaration)')
+            for action, path in sorted(diff_trees(want, have), key=lambda x: x[1])
+        ]
+        return '\n'.join(lines) + '\n'
+
     def check_for_task(self, task):
+        """Poll the task until it completes, with an exponential backoff and jitter between polls.
+
+        Raises F5CollectionError when the task fails or does not complete within ``timeout`` seconds.
+        """
         url = urlparse(task).path
-        for x in range (0, 60):
+        backoff = PollBackoff(self.want.timeout, self.want.poll_interval)
+        # Polls and elapsed time add up over all the tasks of the run.
+        elapsed = self.elapsed
+        while True:
             response = self.client.get(url, account_id=self.want.preferred_account_id)
-            if response['code'] == 200:
-                if response['contents']['status'] == 'Completed':
-                    return True
-                if response['contents']['status'] == 'Failed':
-                    raise F5CollectionError(response['contents']['error'])
-            else:
+            self.polls += 1
+            self.elapsed = elapsed + backoff.elapsed
+            if response['code'] != 200:
                 raise F5CollectionError(response['code'], response['contents'])
+            status = response['contents']['status']
+            if status == 'Completed':
+                return response['contents']
+            if status == 'Failed':
+                raise F5CollectionError(response['contents']['error'])
+            if not backoff.sleep():
+                raise F5CollectionError(
+                    "Task {0} did not complete within {1} seconds, its last status was '{2}' after {3} polls.".format(
+                        task, self.want.timeout, status, self.polls
+                    )
+                )
+
+    def read_current_from_device(self):
+        response = self.client.post(self.url, data={"action": "get"}, account_id=self.want.preferred_account_id)
+        if response['code'] != 200:
+            raise F5CollectionError(response['code'], response['contents'])
+        contents = response['contents']
+        if 'declaration' not in contents and 'taskReference' in contents:
+            # The current declaration is returned by the task when the service answers asynchronously
+            contents = self.check_for_task(contents['taskReference']).get('task') or {}
+        return ApiParameters(params=dict(content=dict(declaration=contents.get('declaration') or [])))
 
     def create_on_device(self):
         payload = {
@@ -205,16 +607,8 @@ class ModuleManager(object):
         try:
             payload.update(self.want.content)
         except ValueError:
-            raise F5CollectionError(
-                "The provided 'declaration' could not be converted into valid json. If you "
-                "are using the 'to_nice_json' filter, please remove it."
-            )
-        response = self.client.post(self.url, data=payload, account_id=self.want.preferred_account_id)
-        if response['code'] == 200:
-            task = response['contents']['taskReference']
-            return self.check_for_task(task)
-        else:
-            raise F5CollectionError(response['code'], response['contents'])
+            raise F5CollectionError(INVALID_CONTENT)
+        return self.send_declaration(payload)
 
     def remove_from_device(self):
         payload = {
@@ -223,13 +617,19 @@ class ModuleManager(object):
         try:
             payload.update(self.want.content)
         except ValueError:
-            raise F5CollectionError(
-                "The provided 'declaration' could not be converted into valid json. If you "
-                "are using the 'to_nice_json' filter, please remove it."
-            )
+            raise F5CollectionError(INVALID_CONTENT)
+        return self.send_declaration(payload)
+
+    def send_declaration(self, payload):
         response = self.client.post(self.url, data=payload, account_id=self.want.preferred_account_id)
         if response['code'] == 200:
+            self.client.invalidate_facts(account_id=self.want.preferred_account_id)
             task = response['contents']['taskReference']
+            if not self.want.wait:
+                self.task_references.append(
+                    dict(task_reference=task, preferred_account_id=self.want.preferred_account_id)
+                )
+                return None
             return self.check_for_task(task)
         else:
             raise F5CollectionError(response['code'], response['contents'])
@@ -241,6 +641,29 @@ class ArgumentSpec(object):
         argument_spec = dict(
             content=dict(type='raw', required=True),
             preferred_account_id=dict(),
+            force=dict(
+                type='bool',
+                default=False
+            ),
+            fingerprint_cache=dict(
+                type='path'
+            ),
+            fingerprint_ttl=dict(
+                type='int',
+                default=3600
+            ),
+            wait=dict(
+                type='bool',
+                default=True
+            ),
+            timeout=dict(
+                type='int',
+                default=300
+            ),
+            poll_interval=dict(
+                type='float',
+                default=10
+            ),
             state=dict(
                 default='present',
                 choices=['present', 'absent']
@@ -258,6 +681,9 @@ def main():
         supports_check_mode=spec.supports_check_mode,
     )
 
+    if module.params['timeout'] <= 0 or module.params['poll_interval'] <= 0:
+        module.fail_json(msg="The timeout and poll_interval parameters must be positive.")
+
     try:
         mm = ModuleManager(module=module, client=Connection(module._socket_path))
         results = mm.exec_module()
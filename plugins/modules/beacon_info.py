@@ -26,16 +26,155 @@ options:
       - Can specify a list of values to include a larger subset.
       - Values can also be used with an initial C(!) to specify that a specific subset
         should not be collected.
+      - The C(summary) subset aggregates the health of the sources, it is not part of C(all) and has to be
+        asked for explicitly.
     type: list
     required: True
     choices:
       - all
       - tokens
       - sources
+      - summary
       - "!all"
       - "!tokens"
       - "!sources"
+      - "!summary"
     aliases: ['include']
+  page_size:
+    description:
+      - Number of tokens or sources requested from the Beacon API per page.
+      - Collections are read page by page and every page is processed as it arrives, so large
+        collections are never held in memory more than once.
+      - Set to C(0) to read each collection with a single request.
+    type: int
+    default: 500
+    version_added: "f5_beacon 1.1"
+  filters:
+    description:
+      - Only return the tokens and sources matching all of the given filters.
+      - Filters on an attribute a resource does not have, for example C(type) on tokens, are ignored for it.
+      - Resources are filtered while each page is processed, before being converted to their returned values.
+    type: dict
+    suboptions:
+      name:
+        description:
+          - Shell style pattern, for example C(bigip-*), the name has to match.
+        type: str
+      type:
+        description:
+          - Type of the sources.
+        type: str
+      token_name:
+        description:
+          - Name of the token the sources use.
+        type: str
+      last_feed_before:
+        description:
+          - Only return sources whose last feed is older than this.
+          - Either a UTC time, for example C(2020-02-27T15:00:00Z) or C(2020-02-27), or an age made of a
+            number and one of the C(s), C(m), C(h), C(d) or C(w) units, for example C(12h).
+          - Sources which never sent data are considered older than any time.
+        type: str
+      last_feed_after:
+        description:
+          - Only return sources whose last feed is newer than this.
+          - Accepts the same values as C(last_feed_before).
+        type: str
+    version_added: "f5_beacon 1.1"
+  fields:
+    description:
+      - Return only these attributes of the tokens and sources.
+      - The C(name) attribute is always returned.
+    type: list
+    elements: str
+    choices:
+      - name
+      - description
+      - access_token
+      - source_count
+      - create_time
+      - type
+      - last_feed_time
+      - token_name
+    version_added: "f5_beacon 1.1"
+  return_facts:
+    description:
+      - When C(yes), the results are also returned in C(ansible_facts) as C(ansible_net_tokens) and
+        C(ansible_net_sources).
+      - Set to C(no) to only return them once, which halves the size of the module result.
+    type: bool
+    default: yes
+    version_added: "f5_beacon 1.1"
+  cache_ttl:
+    description:
+      - Number of seconds the results are kept by the persistent connection and returned again, without
+        contacting F5 Cloud Services, to C(beacon_info) tasks asking for the same account, C(gather_subset),
+        C(filters) and C(fields).
+      - Cached results of an account are dropped when C(beacon_token) or C(beacon_declaration) change it.
+      - The number of cached results is limited by the C(ansible_f5cs_fact_cache_size) connection variable.
+      - Set to C(0) to neither use nor store cached results.
+    type: int
+    default: 0
+    version_added: "f5_beacon 1.1"
+  flush_cache:
+    description:
+      - When C(yes), all cached results of the account are dropped and the information is read from
+        F5 Cloud Services.
+    type: bool
+    default: no
+    version_added: "f5_beacon 1.1"
+  since_state:
+    description:
+      - The C(state) returned by an earlier run of the module.
+      - When set, only the tokens and sources added, changed or removed since that run are returned,
+        in C(delta), together with the new C(state).
+      - Takes precedence over the state read from C(state_file).
+    type: dict
+    version_added: "f5_beacon 1.1"
+  state_file:
+    description:
+      - File keeping the C(state) between runs of the module.
+      - When set, only the tokens and sources added, changed or removed since the state was saved are
+        returned, in C(delta), and the file is updated with the new state.
+      - On the first run, when the file does not exist, every token and source is reported as added.
+      - Items are compared on the values returned with the current C(fields), changing C(fields) between
+        runs reports every item as changed.
+    type: path
+    version_added: "f5_beacon 1.1"
+  dest:
+    description:
+      - Write the tokens and sources to this file instead of returning them.
+      - The file holds one JSON object per line, with the name of its subset in a C(subset) key, in the
+        order the API returns them. It is gzip compressed when its name ends with C(.gz).
+      - Pages are written as they are read, so memory use does not depend on the size of the account.
+      - Only the number of written items, the path and the checksum of the file are returned.
+      - Cannot be used together with C(since_state) or C(state_file), results are never cached.
+    type: path
+    version_added: "f5_beacon 1.1"
+  stale_after:
+    description:
+      - Sources which did not send data for this long are counted as stale in the C(summary) subset.
+      - An age made of a number and one of the C(s), C(m), C(h), C(d) or C(w) units, or a UTC time.
+    type: str
+    default: 15m
+    version_added: "f5_beacon 1.1"
+  return_stale:
+    description:
+      - When C(yes), the C(summary) subset also lists the stale sources.
+    type: bool
+    default: no
+    version_added: "f5_beacon 1.1"
+  account_ids:
+    description:
+      - Gather the information of each of these accounts instead of the C(preferred_account_id) one.
+      - The accounts are queried concurrently over the same connection, the number of parallel requests
+        is limited by the C(ansible_f5cs_max_concurrent_requests) connection variable.
+      - Results are returned per account in C(accounts). An account which cannot be queried is reported
+        with its error and listed in C(failed_accounts), without failing the task.
+      - Cannot be used together with C(since_state), C(state_file) or C(dest).
+    type: list
+    elements: str
+    version_added: "f5_beacon 1.1"
 extends_documentation_fragment: f5networks.f5_beacon.f5cs
 author:
   - Wojciech Wypior (@wojtek0806)
@@ -70,6 +209,56 @@ EXAMPLES = r'''
         gather_subset:
           - all
           - "!sources"
+
+    - name: Collect Beacon sources, 1000 at a time
+      beacon_info:
+        gather_subset:
+          - sources
+        page_size: 1000
+
+    - name: Collect sources of a token not seen for a day, without duplicating them in facts
+      beacon_info:
+        gather_subset:
+          - sources
+        filters:
+          token_name: foo_token
+          last_feed_before: 1d
+        fields:
+          - last_feed_time
+        return_facts: no
+
+    - name: Collect Beacon information, reusing results read during the last 5 minutes
+      beacon_info:
+        gather_subset:
+          - all
+        cache_ttl: 300
+
+    - name: Report sources added, changed or removed since the last run
+      beacon_info:
+        gather_subset:
+          - sources
+        state_file: /var/tmp/beacon_sources.state
+
+    - name: Export all sources to a compressed file
+      beacon_info:
+        gather_subset:
+          - sources
+        dest: /var/tmp/beacon_sources.ndjson.gz
+
+    - name: Summarize the health of the sources, listing those silent for an hour
+      beacon_info:
+        gather_subset:
+          - summary
+        stale_after: 1h
+        return_stale: yes
+
+    - name: Collect the tokens of several accounts
+      beacon_info:
+        gather_subset:
+          - tokens
+        account_ids:
+          - a-aaQsw6MlaD
+          - a-aaLnQ7vd1S
 '''
 
 RETURN = r'''
@@ -138,9 +327,113 @@ tokens:
       returned: queried
       sample: "2020-02-12T13:30:44.272728Z"
   sample: hash/dictionary of values      
+delta:
+  description:
+    - Tokens and sources added, changed or removed since the previous state, per gathered subset.
+  returned: When C(since_state) or C(state_file) are specified.
+  type: complex
+  contains:
+    added:
+      description:
+        - Tokens or sources not in the previous state.
+      returned: queried
+      type: list
+    changed:
+      description:
+        - Tokens or sources whose returned values differ from the previous state.
+      returned: queried
+      type: list
+    removed:
+      description:
+        - Names of the tokens or sources which are gone.
+      returned: queried
+      type: list
+      sample: ["bit3.lab5.defense.net"]
+    counts:
+      description:
+        - Number of added, changed, removed and unchanged items.
+      returned: queried
+      type: dict
+      sample: {"added": 1, "changed": 0, "removed": 1, "unchanged": 42}
+  sample: {"sources": {"added": [], "changed": [], "removed": [], "counts": {}}}
+state:
+  description:
+    - Hash of the returned values of every token and source, by name, to pass as C(since_state) to a later run.
+  returned: When C(since_state) or C(state_file) are specified.
+  type: dict
+  sample: {"sources": {"bit3.lab5.defense.net": "1d5a3e2f0b9c4d7e"}}
+summary:
+  description: Health of the sources, overall and per source type and token.
+  returned: When C(summary) is specified in C(gather_subset).
+  type: complex
+  contains:
+    stale_before:
+      description:
+        - Sources whose last feed is older than this time are stale.
+      returned: queried
+      type: str
+      sample: "2020-02-27T15:34:48Z"
+    total:
+      description:
+        - Number of sources and of stale sources, number of sources per time since their last feed,
+          and the oldest and newest last feed time.
+      returned: queried
+      type: dict
+      sample: {"count": 8, "stale": 2, "buckets": {"15m": 6, "1h": 0, "1d": 0, "7d": 0, "older": 2,
+               "never": 0}, "oldest": "2020-01-23T08:44:50Z", "newest": "2020-02-27T15:49:48Z"}
+    groups:
+      description:
+        - The same figures as C(total) for each combination of C(type) and C(token_name).
+      returned: queried
+      type: list
+    stale:
+      description:
+        - The stale sources.
+      returned: When C(return_stale) is C(yes).
+      type: list
+  sample: hash/dictionary of values
+accounts:
+  description:
+    - Information gathered for each account, by account id, with the same keys as for a single account.
+    - Accounts which could not be queried have C(failed) set and the error in C(msg).
+  returned: When C(account_ids) is specified.
+  type: dict
+  sample: {"a-aaQsw6MlaD": {"queried": true, "tokens": []}, "a-aaLnQ7vd1S": {"failed": true, "msg": "Forbidden"}}
+failed_accounts:
+  description: Ids of the accounts which could not be queried.
+  returned: When C(account_ids) is specified.
+  type: list
+  sample: ["a-aaLnQ7vd1S"]
+dest:
+  description: Path of the file the tokens and sources were written to.
+  returned: When C(dest) is specified.
+  type: str
+  sample: /var/tmp/beacon_sources.ndjson.gz
+checksum:
+  description: SHA-256 checksum of the written file.
+  returned: When C(dest) is specified.
+  type: str
+  sample: 2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae
+counts:
+  description: Number of tokens and sources written to the file, per gathered subset.
+  returned: When C(dest) is specified.
+  type: dict
+  sample: {"sources": 52000, "tokens": 40}
 '''
 
 
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from datetime import datetime
+
+from ansible.module_utils._text import to_bytes
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import Connection
 from ansible.module_utils.six import iteritems
@@ -149,9 +442,72 @@ from ansible.module_utils.six import string_types
 try:
     from plugins.module_utils.common import AnsibleF5Parameters
     from plugins.module_utils.common import F5CollectionError
+    from plugins.module_utils.common import FieldMapper
 except ImportError:
     from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import AnsibleF5Parameters
     from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import F5CollectionError
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import FieldMapper
+
+
+RELATIVE_TIME_RE = re.compile(r'^(\d+)\s*([smhdw])$')
+
+TIME_UNITS = dict(s=1, m=60, h=3600, d=86400, w=604800)
+
+# API timestamps are compared on their first 19 characters, which is exact to the second.
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Upper bounds of the time since the last feed of the sources counted in each bucket of the summary.
+STALENESS_BUCKETS = (
+    ('15m', 900),
+    ('1h', 3600),
+    ('1d', 86400),
+    ('7d', 604800),
+)
+
+
+def parse_time(value):
+    """Return the UTC time described by ``value`` in the format of the API timestamps.
+
+    ``value`` is either a time, like ``2020-02-27T15:49:48Z`` or ``2020-02-27``, or an age like ``12h``.
+    """
+    value = value.strip()
+    match = RELATIVE_TIME_RE.match(value)
+    if match:
+        seconds = int(match.group(1)) * TIME_UNITS[match.group(2)]
+        return time.strftime(TIME_FORMAT, time.gmtime(time.time() - seconds))
+    timestamp = value.rstrip('Z').replace(' ', 'T')[:19]
+    for fmt in (TIME_FORMAT, '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(timestamp, fmt).strftime(TIME_FORMAT)
+        except ValueError:
+            pass
+    raise F5CollectionError(
+        "The specified time '{0}' is neither a UTC time nor an age.".format(value)
+    )
+
+
+def build_matchers(filters):
+    """Return ``(returnable, predicate)`` tuples for the given ``filters`` option."""
+    result = []
+    if filters.get('name') is not None:
+        pattern = re.compile(fnmatch.translate(filters['name']))
+        result.append(('name', lambda v: v is not None and pattern.match(v) is not None))
+    for key in ('type', 'token_name'):
+        if filters.get(key) is not None:
+            result.append((key, lambda v, wanted=filters[key]: v == wanted))
+    if filters.get('last_feed_before') is not None:
+        before = parse_time(filters['last_feed_before'])
+        result.append(('last_feed_time', lambda v: not v or v[:19] < before))
+    if filters.get('last_feed_after') is not None:
+        after = parse_time(filters['last_feed_after'])
+        result.append(('last_feed_time', lambda v: bool(v) and v[:19] > after))
+    return result
+
+
+def digest(item):
+    """Return a short hash of the returned values of a token or source."""
+    data = json.dumps(item, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(to_bytes(data)).hexdigest()[:16]
 
 
 class Parameters(AnsibleF5Parameters):
@@ -179,20 +535,187 @@ class BaseParameters(Parameters):
         return result
 
 
+class NdjsonWriter(object):
+    """Write tokens and sources to a newline delimited JSON file, one object per line.
+
+    Each object carries the name of its subset in a ``subset`` key. The file is gzip compressed when
+    its name ends with ``.gz``. It is written under a temporary name and only renamed once complete.
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        fd, self.tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', prefix='.tmp-')
+        self.file = os.fdopen(fd, 'wb')
+        if self.path.endswith('.gz'):
+            self.stream = gzip.GzipFile(fileobj=self.file, mode='wb', mtime=0)
+        else:
+            self.stream = self.file
+
+    def write(self, subset, items):
+        lines = []
+        for item in items:
+            item['subset'] = subset
+            lines.append(json.dumps(item, sort_keys=True) + '\n')
+        self.stream.write(to_bytes(''.join(lines)))
+        return len(lines)
+
+    def close(self):
+        """Complete the file and return its SHA-256 checksum."""
+        self.stream.close()
+        self.file.close()
+        os.rename(self.tmp, self.path)
+        checksum = hashlib.sha256()
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                checksum.update(chunk)
+        return checksum.hexdigest()
+
+    def abort(self):
+        self.stream.close()
+        self.file.close()
+        if os.path.exists(self.tmp):
+            os.unlink(self.tmp)
+
+
+def run_readers(client, readers, errors=None):
+    """Drive paged readers until all of them are done.
+
+    A reader is a generator yielding request dicts, as accepted by the ``send_requests`` method of the
+    httpapi plugin, and receiving the response of each request. The pending requests of all readers are
+    sent together, so the plugin fetches them concurrently with its own bounded parallelism. Connection
+    failures come back as responses without a code, so they are handled by the reader like other errors.
+
+    Responses are handed back in the order of ``readers``, so the first error raised by a reader is
+    the same from one run to the next. When an ``errors`` dict is given, errors are stored in it by
+    index of the failed reader, and the other readers carry on.
+    """
+    pending = [(index, reader, next(reader)) for index, reader in enumerate(readers)]
+    while pending:
+        responses = client.send_requests([request for index, reader, request in pending])
+
+        remaining = []
+        for (index, reader, request), response in zip(pending, responses):
+            try:
+                remaining.append((index, reader, reader.send(response)))
+            except StopIteration:
+                pass
+            except F5CollectionError as ex:
+                if errors is None:
+                    raise
+                errors[index] = ex
+        pending = remaining
+
+
+def share_readers(managers):
+    """Return the managers which have to read their collection.
+
+    When several managers need the same collection, the first one reads it and hands every page to
+    the others, so the collection is only downloaded once.
+    """
+    readers = []
+    by_uri = dict()
+    for manager in managers:
+        leader = by_uri.get(manager.collection_uri)
+        if leader is None:
+            by_uri[manager.collection_uri] = manager
+            readers.append(manager)
+        else:
+            leader.followers.append(manager)
+    return readers
+
+
 class BaseManager(object):
+    collection_uri = None
+    collection_key = None
+    parameters_class = BaseParameters
+    # Aggregates return a computed summary of the collection instead of its items, so they are
+    # neither exported item by item nor compared in delta mode.
+    aggregate = False
+
     def __init__(self, *args, **kwargs):
         self.module = kwargs.get('module', None)
         self.client = kwargs.get('client', None)
         self.kwargs = kwargs
         self.preferred_account_id = self.module.params.get('preferred_account_id', None)
+        self.page_size = self.module.params.get('page_size', None)
+        self.facts = []
+        self.writer = None
+        self.count = 0
+        # Managers of the same collection, which are handed the pages read by this one.
+        self.followers = []
+        self.matchers = self.get_matchers(self.module.params.get('filters', None) or {})
+        self.returnables = self.get_returnables(self.module.params.get('fields', None))
+        self.mapper = FieldMapper.for_class(self.parameters_class, self.returnables)
+
+    def get_matchers(self, filters):
+        # Filters apply to raw API resources, so look their values up by API name.
+        api_names = dict((v, k) for k, v in iteritems(self.parameters_class.api_map))
+        returnables = self.parameters_class.returnables
+        return [
+            (api_names.get(returnable, returnable), predicate)
+            for returnable, predicate in build_matchers(filters) if returnable in returnables
+        ]
+
+    def get_returnables(self, fields):
+        if not fields:
+            return None
+        return [x for x in self.parameters_class.returnables if x == 'name' or x in fields]
+
+    def matches(self, resource):
+        for key, predicate in self.matchers:
+            if not predicate(resource.get(key)):
+                return False
+        return True
 
     def exec_module(self):
-        results = []
-        facts = self.read_facts()
-        for item in facts:
-            attrs = item.to_return()
-            results.append(attrs)
-        return results
+        run_readers(self.client, [self.read_pages()])
+        return self.results()
+
+    def results(self):
+        self.facts.sort(key=lambda k: k['name'])
+        return {self.collection_key: self.facts}
+
+    @property
+    def result_key(self):
+        return self.collection_key
+
+    def process_page(self, page):
+        # Pages are converted as they arrive, so only the returned values are kept.
+        items = (self.mapper(x) for x in page if not self.matchers or self.matches(x))
+        if self.writer is not None:
+            self.count += self.writer.write(self.collection_key, items)
+        else:
+            self.facts.extend(items)
+
+    def page_request(self, offset):
+        uri = self.collection_uri
+        if self.page_size:
+            uri = '{0}?limit={1}&offset={2}'.format(uri, self.page_size, offset)
+        return dict(method='GET', url=uri, account_id=self.preferred_account_id)
+
+    def read_pages(self):
+        """Reader of the collection, yielding the request of every page, see ``run_readers``.
+
+        The last page is the first one holding less than ``page_size`` resources. If the API ignores
+        the paging parameters and answers with the same page again, we stop there as well.
+        """
+        offset = 0
+        first = None
+        while True:
+            response = yield self.page_request(offset)
+            if response['code'] != 200:
+                raise F5CollectionError(response['contents'])
+            contents = response['contents']
+            page = contents.get(self.collection_key) if isinstance(contents, dict) else None
+            page = page or []
+            if not page or (offset and page[0] == first):
+                return
+            self.process_page(page)
+            for follower in self.followers:
+                follower.process_page(page)
+            if not self.page_size or len(page) != self.page_size:
+                return
+            first = page[0]
+            offset += len(page)
 
 
 class TokenParameters(BaseParameters):
@@ -212,44 +735,16 @@ class TokenParameters(BaseParameters):
 
 
 class TokenManager(BaseManager):
+    collection_uri = '/beacon/v1/telemetry-token'
+    collection_key = 'tokens'
+    parameters_class = TokenParameters
+
     def __init__(self, *args, **kwargs):
         self.client = kwargs.get('client', None)
         self.module = kwargs.get('module', None)
         super(TokenManager, self).__init__(**kwargs)
         self.want = TokenParameters(params=self.module.params)
 
-    def exec_module(self):
-        facts = self._exec_module()
-        result = dict(tokens=facts)
-        return result
-
-    def _exec_module(self):
-        results = []
-        facts = self.read_facts()
-        for item in facts:
-            attrs = item.to_return()
-            results.append(attrs)
-        results = sorted(results, key=lambda k: k['name'])
-        return results
-
-    def read_facts(self):
-        results = []
-        collection = self.read_collection_from_device()
-        for resource in collection:
-            params = TokenParameters(params=resource)
-            results.append(params)
-        return results
-
-    def read_collection_from_device(self):
-        uri = '/beacon/v1/telemetry-token'
-        response = self.client.get(uri, account_id=self.preferred_account_id)
-        if response['code'] != 200:
-            raise F5CollectionError(response['contents'])
-        if 'tokens' not in response['contents'] or len(response['contents']['tokens']) == 0:
-            return []
-        result = response['contents']['tokens']
-        return result
-
 
 class SourcesParameters(BaseParameters):
     api_map = {
@@ -266,43 +761,106 @@ class SourcesParameters(BaseParameters):
 
 
 class SourcesManager(BaseManager):
+    collection_uri = '/beacon/v1/sources'
+    collection_key = 'sources'
+    parameters_class = SourcesParameters
+
     def __init__(self, *args, **kwargs):
         self.client = kwargs.get('client', None)
         self.module = kwargs.get('module', None)
         super(SourcesManager, self).__init__(**kwargs)
         self.want = SourcesParameters(params=self.module.params)
 
-    def exec_module(self):
-        facts = self._exec_module()
-        result = dict(sources=facts)
-        return result
 
-    def _exec_module(self):
-        results = []
-        facts = self.read_facts()
-        for item in facts:
-            attrs = item.to_return()
-            results.append(attrs)
-        results = sorted(results, key=lambda k: k['name'])
-        return results
+class SummaryManager(SourcesManager):
+    """Health summary of the sources, aggregated in a single pass while the pages are read.
 
-    def read_facts(self):
-        results = []
-        collection = self.read_collection_from_device()
-        for resource in collection:
-            params = SourcesParameters(params=resource)
-            results.append(params)
-        return results
+    Last feed times are compared as UTC timestamp strings against thresholds computed once, so
+    sources are never parsed into dates.
+    """
+    aggregate = True
 
-    def read_collection_from_device(self):
-        uri = '/beacon/v1/sources'
-        response = self.client.get(uri, account_id=self.preferred_account_id)
-        if response['code'] != 200:
-            raise F5CollectionError(response['contents'])
-        if 'sources' not in response['contents'] or len(response['contents']['sources']) == 0:
-            return []
-        result = response['contents']['sources']
-        return result
+    def __init__(self, *args, **kwargs):
+        super(SummaryManager, self).__init__(**kwargs)
+        now = time.time()
+        self.stale_before = parse_time(self.module.params.get('stale_after', None) or '15m')
+        self.return_stale = self.module.params.get('return_stale', False)
+        self.buckets = [
+            (label, time.strftime(TIME_FORMAT, time.gmtime(now - seconds))) for label, seconds in STALENESS_BUCKETS
+        ]
+        self.total = self.new_group()
+        self.groups = {}
+        self.stale = []
+
+    @property
+    def result_key(self):
+        return 'summary'
+
+    def new_group(self):
+        buckets = dict((label, 0) for label, seconds in STALENESS_BUCKETS)
+        buckets['older'] = 0
+        buckets['never'] = 0
+        return dict(count=0, stale=0, buckets=buckets, oldest=None, newest=None)
+
+    def get_bucket(self, feed):
+        if feed is None:
+            return 'never'
+        for label, threshold in self.buckets:
+            if feed >= threshold:
+                return label
+        return 'older'
+
+    @staticmethod
+    def add(group, feed, bucket, stale):
+        group['count'] += 1
+        group['buckets'][bucket] += 1
+        if stale:
+            group['stale'] += 1
+        if feed is not None:
+            if group['oldest'] is None or feed < group['oldest']:
+                group['oldest'] = feed
+            if group['newest'] is None or feed > group['newest']:
+                group['newest'] = feed
+
+    def process_page(self, page):
+        for resource in page:
+            if self.matchers and not self.matches(resource):
+                continue
+            feed = resource.get('lastFeedTime')
+            feed = feed[:19] if feed else None
+            bucket = self.get_bucket(feed)
+            stale = feed is None or feed < self.stale_before
+            key = (resource.get('type'), resource.get('tokenName'))
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = self.new_group()
+            self.add(group, feed, bucket, stale)
+            self.add(self.total, feed, bucket, stale)
+            if stale and self.return_stale:
+                self.stale.append(self.mapper(resource))
+
+    def results(self):
+        groups = []
+        for key in sorted(self.groups, key=lambda k: (k[0] or '', k[1] or '')):
+            group = self.groups[key]
+            group.update(type=key[0], token_name=key[1])
+            groups.append(self.to_times(group))
+        result = dict(
+            stale_before=self.stale_before + 'Z',
+            total=self.to_times(self.total),
+            groups=groups,
+        )
+        if self.return_stale:
+            self.stale.sort(key=lambda k: k['name'])
+            result['stale'] = self.stale
+        return {self.result_key: result}
+
+    @staticmethod
+    def to_times(group):
+        for key in ('oldest', 'newest'):
+            if group[key] is not None:
+                group[key] += 'Z'
+        return group
 
 
 class ModuleManager(object):
@@ -314,9 +872,27 @@ class ModuleManager(object):
         self.managers = {
             'tokens': TokenManager,
             'sources': SourcesManager,
+            'summary': SummaryManager,
         }
 
     def exec_module(self):
+        delta = self.want.since_state is not None or self.want.state_file
+        if self.want.account_ids:
+            if delta or self.want.dest:
+                raise F5CollectionError(
+                    "The 'account_ids' option cannot be used together with 'since_state', 'state_file' or 'dest'."
+                )
+            return self.exec_accounts()
+        if delta and self.want.dest:
+            raise F5CollectionError(
+                "The 'dest' option cannot be used together with 'since_state' or 'state_file'."
+            )
+        result = self._exec_module()
+        if delta:
+            result = self.to_delta(result)
+        return result
+
+    def get_subsets(self):
         self.handle_all_keyword()
         res = self.check_valid_gather_subset(self.want.gather_subset)
         if res:
@@ -324,7 +900,20 @@ class ModuleManager(object):
             raise F5CollectionError(
                 "The specified 'gather_subset' options are invalid: {0}".format(invalid)
             )
-        result = self.filter_excluded_facts()
+        return self.filter_excluded_facts()
+
+    def _exec_module(self):
+        result = self.get_subsets()
+
+        cache_key = self.get_cache_key(result)
+        account_id = self.want.preferred_account_id
+        cache_ttl = 0 if self.want.dest else self.want.cache_ttl
+        if self.want.flush_cache:
+            self.client.invalidate_facts(account_id=account_id)
+        elif cache_ttl:
+            cached = self.client.get_cached_facts(cache_key, account_id=account_id)
+            if cached is not None:
+                return cached
 
         managers = []
         for name in result:
@@ -338,13 +927,177 @@ class ModuleManager(object):
             )
             return result
 
+        if self.want.dest:
+            return self.export(managers)
+
         result = self.execute_managers(managers)
         if result:
             result['queried'] = True
         else:
             result['queried'] = False
+        if cache_ttl:
+            self.client.cache_facts(cache_key, result, cache_ttl, account_id=account_id)
+        return result
+
+    def exec_accounts(self):
+        """Gather the same subsets for several accounts at once.
+
+        The page requests of all accounts are sent together, and an account failing is reported in
+        its own result without failing the others.
+        """
+        subsets = self.get_subsets()
+        cache_key = self.get_cache_key(subsets)
+        accounts = dict()
+        pending = []
+        account_ids = []
+        for account_id in self.want.account_ids:
+            if account_id in account_ids:
+                continue
+            account_ids.append(account_id)
+            if self.want.flush_cache:
+                self.client.invalidate_facts(account_id=account_id)
+            elif self.want.cache_ttl:
+                cached = self.client.get_cached_facts(cache_key, account_id=account_id)
+                if cached is not None:
+                    accounts[account_id] = cached
+                    continue
+            managers = []
+            for name in subsets:
+                manager = self.get_manager(name)
+                if manager:
+                    manager.preferred_account_id = account_id
+                    managers.append(manager)
+            pending.append((account_id, managers))
+
+        readers = []
+        for account_id, managers in pending:
+            readers.append(share_readers(managers))
+        errors = dict()
+        if pending:
+            run_readers(self.client, [x.read_pages() for managers in readers for x in managers], errors=errors)
+
+        index = 0
+        for (account_id, managers), leaders in zip(pending, readers):
+            failed = [errors[x] for x in range(index, index + len(leaders)) if x in errors]
+            index += len(leaders)
+            if failed:
+                accounts[account_id] = dict(queried=False, failed=True, msg=str(failed[0]))
+                continue
+            result = dict()
+            for manager in managers:
+                result.update(manager.results())
+            result['queried'] = bool(result)
+            if self.want.cache_ttl:
+                self.client.cache_facts(cache_key, result, self.want.cache_ttl, account_id=account_id)
+            accounts[account_id] = result
+
+        return dict(
+            queried=any(x.get('queried') for x in accounts.values()),
+            accounts=accounts,
+            failed_accounts=[x for x in account_ids if accounts[x].get('failed')],
+        )
+
+    def export(self, managers):
+        """Stream the tokens and sources to ``dest`` as their pages arrive, only returning counts."""
+        writer = NdjsonWriter(self.want.dest)
+        exported = [x for x in managers if not x.aggregate]
+        try:
+            for manager in exported:
+                manager.writer = writer
+            results = self.execute_managers(managers)
+        except Exception:
+            writer.abort()
+            raise
+        checksum = writer.close()
+        result = dict(
+            queried=True,
+            dest=writer.path,
+            checksum=checksum,
+            counts=dict((manager.result_key, manager.count) for manager in exported),
+        )
+        for manager in managers:
+            if manager.aggregate:
+                result[manager.result_key] = results[manager.result_key]
         return result
 
+    def to_delta(self, result):
+        """Replace the gathered tokens and sources by what changed since the previous state.
+
+        Previous and current items are joined on their name through the state dictionaries, so the
+        comparison is linear in the size of the collections.
+        """
+        previous = self.want.since_state
+        if previous is None:
+            previous = self.load_state()
+        state = dict(previous)
+        delta = dict()
+        for key, manager in iteritems(self.managers):
+            if manager.aggregate:
+                if key in result:
+                    delta[key] = result[key]
+                continue
+            if key not in result:
+                continue
+            before = previous.get(key) or {}
+            current = state[key] = {}
+            added = []
+            changed = []
+            unchanged = 0
+            for item in result[key]:
+                hashed = current[item['name']] = digest(item)
+                old = before.get(item['name'])
+                if old is None:
+                    added.append(item)
+                elif old != hashed:
+                    changed.append(item)
+                else:
+                    unchanged += 1
+            removed = sorted(x for x in before if x not in current)
+            delta[key] = dict(
+                added=added,
+                changed=changed,
+                removed=removed,
+                counts=dict(added=len(added), changed=len(changed), removed=len(removed), unchanged=unchanged),
+            )
+
+        if self.want.state_file:
+            self.save_state(state)
+        return dict(queried=result['queried'], delta=delta, state=state)
+
+    def load_state(self):
+        path = os.path.expanduser(self.want.state_file)
+        if not os.path.exists(path):
+            return dict()
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except ValueError:
+            raise F5CollectionError(
+                "The state file '{0}' does not hold a valid state.".format(self.want.state_file)
+            )
+
+    def save_state(self, state):
+        path = os.path.expanduser(self.want.state_file)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, sort_keys=True, separators=(',', ':'))
+            os.rename(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def get_cache_key(self, subsets):
+        # Everything changing the returned values is part of the key, the account id is kept by the cache.
+        return json.dumps(dict(
+            gather_subset=sorted(subsets),
+            filters=self.want.filters,
+            fields=sorted(self.want.fields or []),
+            stale_after=self.want.stale_after if 'summary' in subsets else None,
+            return_stale=self.want.return_stale if 'summary' in subsets else None,
+        ), sort_keys=True)
+
     def filter_excluded_facts(self):
         # Remove the excluded entries from the list of possible facts
         exclude = [x[1:] for x in self.want.gather_subset if x[0] == '!']
@@ -355,7 +1108,8 @@ class ModuleManager(object):
     def handle_all_keyword(self):
         if 'all' not in self.want.gather_subset:
             return
-        managers = list(self.managers.keys()) + self.want.gather_subset
+        # Aggregates are computed on top of the collections, so they are only gathered when asked for
+        managers = [k for k, v in iteritems(self.managers) if not v.aggregate] + self.want.gather_subset
         managers.remove('all')
         self.want.update({'gather_subset': managers})
 
@@ -381,10 +1135,18 @@ class ModuleManager(object):
 
     @staticmethod
     def execute_managers(managers):
+        """Gather the facts of all managers at once.
+
+        The page requests of every manager are sent together, so gathering several subsets costs about
+        as much as the slowest of them. Results are merged in the order of ``managers``.
+        """
+        if len(managers) == 1:
+            return managers[0].exec_module()
+
+        run_readers(managers[0].client, [manager.read_pages() for manager in share_readers(managers)])
         results = dict()
         for manager in managers:
-            result = manager.exec_module()
-            results.update(result)
+            results.update(manager.results())
         return results
 
     def get_manager(self, which):
@@ -413,11 +1175,73 @@ class ArgumentSpec(object):
                     'all',
                     'tokens',
                     'sources',
+                    'summary',
                     '!all',
                     '!tokens',
                     '!sources',
+                    '!summary',
+                ]
+            ),
+            page_size=dict(
+                type='int',
+                default=500
+            ),
+            filters=dict(
+                type='dict',
+                options=dict(
+                    name=dict(),
+                    type=dict(),
+                    token_name=dict(),
+                    last_feed_before=dict(),
+                    last_feed_after=dict(),
+                )
+            ),
+            fields=dict(
+                type='list',
+                elements='str',
+                choices=[
+                    'name',
+                    'description',
+                    'access_token',
+                    'source_count',
+                    'create_time',
+                    'type',
+                    'last_feed_time',
+                    'token_name',
                 ]
             ),
+            return_facts=dict(
+                type='bool',
+                default=True
+            ),
+            cache_ttl=dict(
+                type='int',
+                default=0
+            ),
+            flush_cache=dict(
+                type='bool',
+                default=False
+            ),
+            since_state=dict(
+                type='dict'
+            ),
+            state_file=dict(
+                type='path'
+            ),
+            dest=dict(
+                type='path'
+            ),
+            stale_after=dict(
+                default='15m'
+            ),
+            return_stale=dict(
+                type='bool',
+                default=False
+            ),
+            account_ids=dict(
+                type='list',
+                elements='str'
+            ),
         )
         self.argument_spec = {}
         self.argument_spec.update(argument_spec)
@@ -431,15 +1255,19 @@ def main():
         supports_check_mode=spec.supports_check_mode
     )
 
+    if module.params['page_size'] < 0:
+        module.fail_json(msg="The page_size parameter must not be negative.")
+
     try:
         mm = ModuleManager(module=module, client=Connection(module._socket_path))
         results = mm.exec_module()
 
         ansible_facts = dict()
 
-        for key, value in iteritems(results):
-            key = 'ansible_net_%s' % key
-            ansible_facts[key] = value
+        if module.params['return_facts']:
+            for key, value in iteritems(results):
+                key = 'ansible_net_%s' % key
+                ansible_facts[key] = value
 
         module.exit_json(ansible_facts=ansible_facts, **results)
     except F5CollectionError as ex:
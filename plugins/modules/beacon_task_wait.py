@@ -0,0 +1,255 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'certified'}
+
+DOCUMENTATION = r'''
+---
+module: beacon_task_wait
+short_description: Wait for Beacon tasks on F5 Cloud Services to complete
+description:
+  - Wait for several Beacon tasks on F5 Cloud Services, like the deployments started by
+    M(beacon_declaration) with C(wait=no), to complete.
+  - All pending tasks are polled together, with a shared exponential backoff starting at half a second
+    and doubling up to C(poll_interval) between polls.
+  - The module fails when any of the tasks fails or does not complete within C(timeout) seconds, the
+    status of every task is returned either way.
+version_added: "f5_beacon 1.1"
+options:
+  tasks:
+    description:
+      - Tasks to wait for.
+      - Each task is either a task reference, or a dict with the C(task_reference) and
+        C(preferred_account_id) keys as returned in C(task_references) by M(beacon_declaration).
+    type: list
+    elements: raw
+    required: True
+  timeout:
+    description:
+      - Number of seconds to wait for all the tasks to complete.
+    type: int
+    default: 300
+  poll_interval:
+    description:
+      - Maximum number of seconds between two polls of the task statuses.
+    type: float
+    default: 10
+extends_documentation_fragment: f5networks.f5_beacon.f5cs
+author:
+  - Wojciech Wypior (@wojtek0806)
+'''
+
+EXAMPLES = r'''
+- name: Start the deployments on every account
+  beacon_declaration:
+    content: "{{ lookup('file', 'decl.json') }}"
+    preferred_account_id: "{{ item }}"
+    wait: no
+  loop: "{{ account_ids }}"
+  register: deployments
+
+- name: Wait for all deployments to complete
+  beacon_task_wait:
+    tasks: "{{ deployments.results | map(attribute='task_references') | select('defined') | flatten }}"
+    timeout: 600
+'''
+
+RETURN = r'''
+tasks:
+  description: Status of each task, in the order of the C(tasks) parameter.
+  returned: always
+  type: complex
+  contains:
+    task_reference:
+      description: Reference of the task.
+      type: str
+      sample: https://api.cloudservices.f5.com/beacon/v1/declare-task/244925
+    preferred_account_id:
+      description: Account the task was polled with.
+      type: str
+      sample: a-aaQsw6MlaD
+    status:
+      description:
+        - Last status of the task, C(Completed), C(Failed) or the status of a task still running.
+        - C(Error) when the status could not be read.
+      type: str
+      sample: Completed
+    error:
+      description: Error reported by a failed task, or by the service when the status could not be read.
+      type: raw
+      sample: {"message": "Invalid declaration", "errors": []}
+    timed_out:
+      description: Whether the task was still running after C(timeout) seconds.
+      type: bool
+      sample: no
+    polls:
+      description: Number of times the task status was requested.
+      type: int
+      sample: 4
+    elapsed:
+      description: Number of seconds until the task was found completed, failed or timed out.
+      type: float
+      sample: 3.52
+polls:
+  description: Number of polling rounds over the pending tasks.
+  returned: always
+  type: int
+  sample: 4
+elapsed:
+  description: Number of seconds spent waiting for the tasks.
+  returned: always
+  type: float
+  sample: 3.52
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.connection import Connection
+from ansible.module_utils.urls import urlparse
+from ansible.module_utils.six import string_types
+
+try:
+    from plugins.module_utils.common import F5CollectionError
+    from plugins.module_utils.common import PollBackoff
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import F5CollectionError
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import PollBackoff
+
+
+DONE_STATUSES = frozenset(['Completed', 'Failed', 'Error'])
+
+
+class ModuleManager(object):
+    def __init__(self, *args, **kwargs):
+        self.module = kwargs.pop('module', None)
+        self.client = kwargs.pop('client', None)
+        self.tasks = []
+        self.polls = 0
+        self.elapsed = 0.0
+
+    def exec_module(self):
+        self.tasks = [self.read_task(x) for x in self.module.params['tasks']]
+        self.wait_for_tasks()
+        return dict(
+            changed=False,
+            tasks=self.tasks,
+            polls=self.polls,
+            elapsed=round(self.elapsed, 2),
+        )
+
+    def read_task(self, task):
+        if isinstance(task, string_types):
+            task = dict(task_reference=task)
+        if not isinstance(task, dict) or not task.get('task_reference'):
+            raise F5CollectionError(
+                "Each task must be a task reference or a dict with a 'task_reference' key, got {0}.".format(task)
+            )
+        return dict(
+            task_reference=task['task_reference'],
+            preferred_account_id=task.get('preferred_account_id') or self.module.params['preferred_account_id'],
+            status=None,
+            error=None,
+            timed_out=False,
+            polls=0,
+            elapsed=0.0,
+        )
+
+    def wait_for_tasks(self):
+        """Poll the pending tasks together until all are done, with an exponential backoff and jitter
+        shared by all tasks between polling rounds.
+        """
+        backoff = PollBackoff(self.module.params['timeout'], self.module.params['poll_interval'])
+        pending = list(self.tasks)
+        while pending:
+            # Connection failures are returned as responses without a code, even for a single task.
+            responses = self.client.send_requests([
+                dict(method='GET', url=urlparse(x['task_reference']).path, account_id=x['preferred_account_id'])
+                for x in pending
+            ])
+            self.polls += 1
+            self.elapsed = backoff.elapsed
+
+            for task, response in zip(pending, responses):
+                task['polls'] += 1
+                task['elapsed'] = round(self.elapsed, 2)
+                if response['code'] != 200:
+                    task.update(status='Error', error=response['contents'])
+                else:
+                    task['status'] = response['contents'].get('status')
+                    if task['status'] == 'Failed':
+                        task['error'] = response['contents'].get('error')
+            pending = [x for x in pending if x['status'] not in DONE_STATUSES]
+
+            if pending and not backoff.sleep():
+                for task in pending:
+                    task['timed_out'] = True
+                return
+
+    def failures(self):
+        """Return a message describing the tasks which did not complete, or None."""
+        failed = [x for x in self.tasks if x['status'] != 'Completed']
+        if not failed:
+            return None
+        return "{0} of {1} tasks did not complete: {2}".format(
+            len(failed), len(self.tasks), ', '.join(
+                "{0} ({1})".format(x['task_reference'], 'timed out' if x['timed_out'] else x['status'])
+                for x in failed
+            )
+        )
+
+
+class ArgumentSpec(object):
+    def __init__(self):
+        self.supports_check_mode = True
+        argument_spec = dict(
+            tasks=dict(
+                type='list',
+                elements='raw',
+                required=True
+            ),
+            preferred_account_id=dict(),
+            timeout=dict(
+                type='int',
+                default=300
+            ),
+            poll_interval=dict(
+                type='float',
+                default=10
+            ),
+        )
+        self.argument_spec = {}
+        self.argument_spec.update(argument_spec)
+
+
+def main():
+    spec = ArgumentSpec()
+
+    module = AnsibleModule(
+        argument_spec=spec.argument_spec,
+        supports_check_mode=spec.supports_check_mode,
+    )
+
+    if module.params['timeout'] <= 0 or module.params['poll_interval'] <= 0:
+        module.fail_json(msg="The timeout and poll_interval parameters must be positive.")
+
+    try:
+        mm = ModuleManager(module=module, client=Connection(module._socket_path))
+        results = mm.exec_module()
+        msg = mm.failures()
+        if msg:
+            module.fail_json(msg=msg, **results)
+        module.exit_json(**results)
+    except F5CollectionError as ex:
+        module.fail_json(msg=str(ex))
+
+
+if __name__ == '__main__':
+    main()
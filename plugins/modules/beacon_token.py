@@ -238,6 +238,7 @@ class ModuleManager(object):
         params = self.changes.api_params()
         response = self.client.post(self.url, data=params, account_id=self.want.preferred_account_id)
         if response['code'] == 200:
+            self.client.invalidate_facts(account_id=self.want.preferred_account_id)
             return True
         else:
             raise F5CollectionError(response['code'], response['contents'])
@@ -245,6 +246,7 @@ class ModuleManager(object):
     def remove_from_device(self):
         response = self.client.delete(self.url + '/' + self.want.name, account_id=self.want.preferred_account_id)
         if response['code'] == 200:
+            self.client.invalidate_facts(account_id=self.want.preferred_account_id)
             return True
         else:
             raise F5CollectionError(response['code'], response['contents'])
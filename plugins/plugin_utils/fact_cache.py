@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class FactCache(object):
+    """Bounded LRU store of module results, each expiring after its own time to live.
+
+    Entries are keyed by account id and a key chosen by the module, so results gathered for one
+    account can be invalidated without touching the others.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, account_id=None):
+        with self._lock:
+            entry = self._entries.get((account_id, key))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[(account_id, key)]
+                return None
+            self._entries[(account_id, key)] = self._entries.pop((account_id, key))
+            return value
+
+    def store(self, key, value, ttl, account_id=None):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop((account_id, key), None)
+            self._entries[(account_id, key)] = (time.time() + ttl, value)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account_id=None):
+        """Drop the entries of ``account_id``, or all of them when no account is given.
+
+        Entries stored without an account id belong to the default account of the user, which may be
+        ``account_id``, so they are always dropped.
+        """
+        with self._lock:
+            if account_id is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if key[0] in (None, account_id):
+                    del self._entries[key]
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonBackend(object):
+    """JSON encoder and decoder used for request and response bodies.
+
+    ``loads`` accepts text, bytes and, with backends supporting it, a memoryview of the response buffer,
+    so responses can be decoded without first being copied into text. Objects the fast backends cannot
+    serialize are handed over to the standard library.
+    """
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+class OrjsonBackend(JsonBackend):
+    name = 'orjson'
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return json.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonBackend(JsonBackend):
+    name = 'ujson'
+
+    def dumps(self, obj):
+        try:
+            return ujson.dumps(obj, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return json.dumps(obj)
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return ujson.loads(data)
+
+
+BACKENDS = dict(
+    orjson=(orjson, OrjsonBackend),
+    ujson=(ujson, UjsonBackend),
+    json=(json, JsonBackend),
+)
+
+
+def get_json_backend(name='auto'):
+    """Return the requested JSON backend, ``auto`` picks the fastest one installed.
+
+    Raises ValueError when a specific backend was requested but is not installed.
+    """
+    if name == 'auto':
+        for candidate in ('orjson', 'ujson', 'json'):
+            library, backend = BACKENDS[candidate]
+            if library is not None:
+                return backend()
+    if name not in BACKENDS:
+        raise ValueError('Unknown JSON backend {0}'.format(name))
+    library, backend = BACKENDS[name]
+    if library is None:
+        raise ValueError('JSON backend {0} is not installed'.format(name))
+    return backend()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import re
+import tempfile
+import threading
+import time
+
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+# Upper bounds in milliseconds of the latency histogram buckets.
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Resources addressed by a user provided name, the name is replaced so calls are grouped per endpoint.
+URL_TEMPLATES = (
+    (re.compile(r'^/beacon/v1/telemetry-token/[^/]+$'), '/beacon/v1/telemetry-token/{name}'),
+)
+
+ID_SEGMENT_RE = re.compile(
+    r'^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|a-[0-9A-Za-z_-]+)$'
+)
+
+
+def normalize_url(url):
+    """Return the URL template of a request path, without the query string and with ids replaced."""
+    path = urlparse(url).path or '/'
+    for pattern, template in URL_TEMPLATES:
+        if pattern.match(path):
+            return template
+    return '/'.join('{id}' if ID_SEGMENT_RE.match(x) else x for x in path.split('/'))
+
+
+class RequestMetrics(object):
+    """Thread safe per-endpoint statistics of the requests sent by the httpapi plugin.
+
+    Calls are grouped by method and URL template, for each we keep the call count, a latency histogram,
+    the number of bytes sent and received, and the count of every response status.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.since = time.time()
+
+    def _new_endpoint(self, method, template):
+        histogram = dict(('{0}'.format(x), 0) for x in LATENCY_BUCKETS)
+        histogram['+Inf'] = 0
+        return dict(
+            method=method,
+            url=template,
+            count=0,
+            latency=dict(total=0.0, min=None, max=None, histogram=histogram),
+            bytes_sent=0,
+            bytes_received=0,
+            status={},
+        )
+
+    def record(self, method, url, status, duration, sent=0, received=0):
+        template = normalize_url(url)
+        key = '{0} {1}'.format(method, template)
+        duration_ms = duration * 1000
+        bucket = '+Inf'
+        for x in LATENCY_BUCKETS:
+            if duration_ms <= x:
+                bucket = '{0}'.format(x)
+                break
+
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = self._new_endpoint(method, template)
+            endpoint['count'] += 1
+            latency = endpoint['latency']
+            latency['total'] += duration
+            latency['min'] = duration if latency['min'] is None else min(latency['min'], duration)
+            latency['max'] = duration if latency['max'] is None else max(latency['max'], duration)
+            latency['histogram'][bucket] += 1
+            endpoint['bytes_sent'] += sent or 0
+            endpoint['bytes_received'] += received or 0
+            status = '{0}'.format(status)
+            endpoint['status'][status] = endpoint['status'].get(status, 0) + 1
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            endpoints = json.loads(json.dumps(self._endpoints))
+            since = self.since
+            if reset:
+                self._endpoints = {}
+                self.since = time.time()
+
+        for endpoint in endpoints.values():
+            endpoint['latency']['mean'] = endpoint['latency']['total'] / endpoint['count']
+        return dict(
+            since=since,
+            until=time.time(),
+            calls=sum(x['count'] for x in endpoints.values()),
+            endpoints=endpoints,
+        )
+
+    def dump(self, path):
+        """Write a snapshot to ``path`` as JSON, the file is replaced atomically."""
+        path = os.path.expanduser(path)
+        directory = os.path.dirname(path) or '.'
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+            os.rename(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
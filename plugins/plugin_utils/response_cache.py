@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import threading
+
+from collections import OrderedDict
+
+from ansible.module_utils.six import string_types
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+
+def _resource_path(url):
+    return urlparse(url).path.rstrip('/')
+
+
+def _related(path, other):
+    """Check whether two resource paths are the same resource, or one is within the other."""
+    return path == other or other.startswith(path + '/') or path.startswith(other + '/')
+
+
+class ResponseCache(object):
+    """Bounded LRU store of GET responses with their ``ETag`` and ``Last-Modified`` validators.
+
+    Entries are keyed by URL and account id. Only responses carrying at least one validator are stored,
+    as there is no way to revalidate them otherwise.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url, account_id=None):
+        with self._lock:
+            entry = self._entries.get((url, account_id))
+            if entry is not None:
+                self._entries[(url, account_id)] = self._entries.pop((url, account_id))
+            return entry
+
+    def validators(self, entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, account_id, headers, contents):
+        if headers is None:
+            return
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        etag = etag if isinstance(etag, string_types) else None
+        last_modified = last_modified if isinstance(last_modified, string_types) else None
+        if not (etag or last_modified):
+            return
+
+        with self._lock:
+            self._entries.pop((url, account_id), None)
+            self._entries[(url, account_id)] = dict(etag=etag, last_modified=last_modified, contents=contents)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        """Drop entries of the resource at ``url``, of resources within it and of collections containing it."""
+        path = _resource_path(url)
+        with self._lock:
+            for key in list(self._entries):
+                if _related(path, _resource_path(key[0])):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import errno
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+
+class TokenCache(object):
+    """On-disk store of F5 Cloud Services tokens shared between processes.
+
+    Each entry is keyed by the service URL and username, and holds the access token, the refresh token
+    and the absolute ``expires_at`` time of the access token. Cache directory and files are only
+    accessible by the owner, as they contain live credentials.
+    """
+    def __init__(self, path, url, username):
+        self.path = os.path.expanduser(path)
+        key = hashlib.sha256('{0}\n{1}'.format(url, username).encode('utf-8')).hexdigest()
+        self.filename = os.path.join(self.path, key + '.json')
+        self.lockname = os.path.join(self.path, key + '.lock')
+
+    def _ensure_dir(self):
+        try:
+            os.makedirs(self.path, 0o700)
+        except OSError as ex:
+            if ex.errno != errno.EEXIST:
+                raise
+
+    @contextmanager
+    def lock(self):
+        """Hold an exclusive lock on the cache entry.
+
+        Other processes block here until the holder has finished logging in, and then read
+        the token it stored instead of logging in themselves.
+        """
+        self._ensure_dir()
+        fd = os.open(self.lockname, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield self
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def read(self, margin=0):
+        """Return the cached entry, or None when it is missing, unreadable or about to expire."""
+        try:
+            with open(self.filename, 'r') as f:
+                entry = json.load(f)
+            if float(entry['expires_at']) - margin <= time.time():
+                return None
+            if not entry['access_token']:
+                return None
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry
+
+    def write(self, access_token, refresh_token, expires_at):
+        self._ensure_dir()
+        entry = dict(
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_at=expires_at
+        )
+        # Write to a temporary file first so readers never observe a partially written entry.
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.rename(tmp, self.filename)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def delete(self):
+        try:
+            os.unlink(self.filename)
+        except OSError as ex:
+            if ex.errno != errno.ENOENT:
+                raise
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import errno
+import socket
+import ssl
+import threading
+import time
+
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+
+from ansible.module_utils._text import to_bytes
+from ansible.module_utils.six import BytesIO
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.error import URLError
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+from ansible.module_utils.six.moves.urllib.request import getproxies
+from ansible.module_utils.six.moves.urllib.request import proxy_bypass
+
+DEFAULT_USER_AGENT = 'ansible-httpget'
+
+# Socket errors raised when the server has silently closed an idle keep-alive connection.
+STALE_CONNECTION_ERRNOS = (errno.EPIPE, errno.ECONNRESET, errno.ECONNABORTED)
+
+# Requests which may be sent again when it is unknown whether the server received them.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds requested by a ``Retry-After`` header, or None if unset or invalid.
+
+    The header holds either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+def is_stale_connection_error(exc):
+    """Check whether an error shows that the server has closed the connection."""
+    if isinstance(exc, http_client.BadStatusLine):
+        return True
+    return isinstance(exc, socket.error) and getattr(exc, 'errno', None) in STALE_CONNECTION_ERRNOS
+
+
+def is_connection_reset(exc):
+    """Check whether a connection error was caused by the peer resetting the connection.
+
+    The httpapi connection and the pool wrap socket errors, so we follow the wrapped errors as well.
+    """
+    for x in range(5):
+        if exc is None:
+            return False
+        if is_stale_connection_error(exc):
+            return True
+        if isinstance(exc, URLError) and isinstance(exc.reason, BaseException):
+            exc = exc.reason
+        else:
+            exc = getattr(exc, '__context__', None)
+    return False
+
+
+class PooledHTTPSConnection(http_client.HTTPSConnection):
+    """HTTPS connection resuming the TLS session negotiated by other connections of the pool."""
+    def __init__(self, host, port=None, pool=None, **kwargs):
+        super(PooledHTTPSConnection, self).__init__(host, port, **kwargs)
+        self.pool = pool
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout, self.source_address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server_hostname = self.host
+        if self._tunnel_host:
+            self.sock = sock
+            self._tunnel()
+            server_hostname = self._tunnel_host
+        self.sock = self._context.wrap_socket(
+            sock, server_hostname=server_hostname, session=self.pool.tls_session
+        )
+        self.pool.tls_session = self.sock.session
+
+
+class ConnectionPool(object):
+    """Small pool of persistent HTTP/1.1 connections to a single host.
+
+    Connections are kept open between requests, so the TCP and TLS handshakes are only paid when a new
+    connection is needed. New connections resume the last TLS session when the server supports it.
+    The pool is thread safe, idle connections above ``size`` are closed.
+    """
+    def __init__(self, url, size=4, timeout=30, validate_certs=True, ca_path=None, client_cert=None,
+                 client_key=None, use_proxy=True):
+        parsed = urlparse(url)
+        self.url = url
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.scheme == 'https' else 80)
+        self.size = size
+        self.timeout = timeout
+        self.tls_session = None
+        self.connections_opened = 0
+        self.proxy = self._get_proxy() if use_proxy else None
+        self.context = self._create_context(validate_certs, ca_path, client_cert, client_key)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create_context(validate_certs, ca_path, client_cert, client_key):
+        context = ssl.create_default_context(cafile=ca_path)
+        if not validate_certs:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        if client_cert:
+            context.load_cert_chain(client_cert, keyfile=client_key)
+        return context
+
+    def _get_proxy(self):
+        proxy = getproxies().get(self.scheme)
+        if not proxy or proxy_bypass(self.host):
+            return None
+        return urlparse(proxy)
+
+    def _new_connection(self):
+        if self.proxy:
+            host, port = self.proxy.hostname, self.proxy.port
+        else:
+            host, port = self.host, self.port
+
+        if self.scheme == 'https':
+            conn = PooledHTTPSConnection(host, port, pool=self, timeout=self.timeout, context=self.context)
+        else:
+            conn = http_client.HTTPConnection(host, port, timeout=self.timeout)
+        if self.proxy:
+            conn.set_tunnel(self.host, self.port)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def _request(conn, path, data, method, headers):
+        conn.request(method, path, body=data, headers=headers)
+        response = conn.getresponse()
+        return response, response.read()
+
+    def send(self, path, data=None, method='GET', headers=None):
+        """Send a request over a pooled connection.
+
+        Returns the response and a buffer with its body, like the httpapi connection ``send`` does.
+        Responses with an error status raise ``HTTPError``, network problems raise ``URLError``.
+        """
+        headers = dict(headers or {})
+        headers.setdefault('User-Agent', DEFAULT_USER_AGENT)
+        method = method or 'GET'
+        if data is not None:
+            data = to_bytes(data)
+
+        conn, reused = self._acquire()
+        try:
+            try:
+                response, body = self._request(conn, path, data, method, headers)
+            except (socket.error, http_client.HTTPException) as ex:
+                if not reused or method not in IDEMPOTENT_METHODS or not is_stale_connection_error(ex):
+                    raise
+                # The server has most likely closed the idle connection, but only idempotent requests
+                # are resent, other ones are left to the retry policy of the caller.
+                conn.close()
+                conn = self._new_connection()
+                response, body = self._request(conn, path, data, method, headers)
+        except (socket.error, http_client.HTTPException) as ex:
+            conn.close()
+            raise URLError(ex)
+
+        if isinstance(conn, PooledHTTPSConnection) and conn.sock is not None:
+            # With TLS 1.3 the session ticket only arrives after the handshake, so pick it up here.
+            self.tls_session = conn.sock.session or self.tls_session
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+        if response.status >= 400:
+            raise HTTPError(self.url + path, response.status, response.reason, response.msg, BytesIO(body))
+        return response, BytesIO(body)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
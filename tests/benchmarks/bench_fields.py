@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Cost of turning raw Beacon sources and tokens into the values returned by beacon_info.
+
+The baseline is the previous path of the info managers, building a parameters object per resource
+and calling its ``to_return``. It is compared with the per-class ``FieldMapper``.
+
+Run from the repository root with ``python -m tests.benchmarks.bench_fields``.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import time
+
+try:
+    from plugins.module_utils.common import FieldMapper
+    from plugins.modules.beacon_info import SourcesParameters
+    from plugins.modules.beacon_info import TokenParameters
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import FieldMapper
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import SourcesParameters
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import TokenParameters
+
+
+def sources(count):
+    return [
+        {
+            'name': 'bigip{0}.lab{1}.example.net'.format(x, x % 50),
+            'type': 'bigip-system' if x % 3 else 'system',
+            'lastFeedTime': '2020-02-27T15:{0:02d}:{1:02d}Z'.format(x % 60, (x * 7) % 60),
+            'tokenName': 'Token_{0}'.format(x % 20),
+        } for x in range(count)
+    ]
+
+
+def tokens(count):
+    return [
+        {
+            'name': 'Token_{0}'.format(x),
+            'description': 'Token generated for the benchmark',
+            'accessToken': 'a-aaLnQ7vd1S#{0:044d}='.format(x),
+            'createTime': '2019-11-13T01:22:54.319082Z',
+            'sourceCount': x % 7,
+        } for x in range(count)
+    ]
+
+
+def best_of(func, repeat):
+    timings = []
+    for x in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def baseline(parameters_class, resources):
+    def run():
+        return [parameters_class(params=resource).to_return() for resource in resources]
+    return run
+
+
+def with_mapper(parameters_class, resources):
+    mapper = FieldMapper.for_class(parameters_class)
+
+    def run():
+        return [mapper(resource) for resource in resources]
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    collections = [
+        ('sources 1k', SourcesParameters, sources(1000)),
+        ('sources 50k', SourcesParameters, sources(50000)),
+        ('tokens 1k', TokenParameters, tokens(1000)),
+        ('tokens 50k', TokenParameters, tokens(50000)),
+    ]
+
+    print('{0:<16} {1:>14} {2:>12} {3:>8}'.format('collection', 'baseline (ms)', 'mapper (ms)', 'speedup'))
+    for name, parameters_class, resources in collections:
+        assert baseline(parameters_class, resources)() == with_mapper(parameters_class, resources)()
+        before = best_of(baseline(parameters_class, resources), args.repeat)
+        after = best_of(with_mapper(parameters_class, resources), args.repeat)
+        print('{0:<16} {1:>14.2f} {2:>12.2f} {3:>7.1f}x'.format(name, before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
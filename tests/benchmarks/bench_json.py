@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Encoding and decoding cost of realistic Beacon payloads in the f5 httpapi plugin.
+
+The baseline is the previous path of the plugin: ``json.dumps`` of the request body, then
+``to_text(response_data.getvalue())`` followed by ``json.loads`` of the text. It is compared with
+the installed JSON backends decoding straight from a view of the response buffer.
+
+Run from the repository root with ``python -m tests.benchmarks.bench_json``.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import json
+import time
+
+from ansible.module_utils._text import to_text
+from ansible.module_utils.six import BytesIO
+
+try:
+    from plugins.plugin_utils.json_backend import BACKENDS
+    from plugins.plugin_utils.json_backend import get_json_backend
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.json_backend import BACKENDS
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.json_backend import get_json_backend
+
+
+def sources_payload(count):
+    return {'sources': [
+        {
+            'name': 'bigip{0}.lab{1}.example.net'.format(x, x % 50),
+            'type': 'bigip-system' if x % 3 else 'system',
+            'lastFeedTime': '2020-02-27T15:{0:02d}:{1:02d}Z'.format(x % 60, (x * 7) % 60),
+            'tokenName': 'Token_{0}'.format(x % 20),
+        } for x in range(count)
+    ]}
+
+
+def declaration_payload(count):
+    return {'action': 'deploy', 'declaration': [
+        {
+            'metadata': {'version': 'v1'},
+            'application': {
+                'name': 'Application_{0}'.format(x),
+                'description': 'Application generated for the benchmark',
+                'labels': {'environment': 'lab', 'owner': 'team{0}'.format(x % 10)},
+                'healthSourceSettings': None,
+                'dependencies': [
+                    {
+                        'name': 'Component_{0}_{1}'.format(x, y),
+                        'description': '',
+                        'labels': {},
+                        'dependencies': [],
+                        'healthSourceSettings': {
+                            'metricSources': [
+                                {
+                                    'measurementName': 'bigip-virtual',
+                                    'tags': {'source': 'bigip{0}'.format(y), 'virtualName': '/Common/vs_{0}'.format(y)},
+                                    'fieldName': 'health',
+                                }
+                            ]
+                        }
+                    } for y in range(10)
+                ]
+            }
+        } for x in range(count)
+    ]}
+
+
+def best_of(func, repeat):
+    timings = []
+    for x in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def baseline(payload, response):
+    def run():
+        json.dumps(payload)
+        json.loads(to_text(BytesIO(response).getvalue()))
+    return run
+
+
+def with_backend(backend, payload, response):
+    def run():
+        backend.dumps(payload)
+        backend.loads(BytesIO(response).getbuffer())
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = [
+        ('sources 1k', sources_payload(1000)),
+        ('sources 10k', sources_payload(10000)),
+        ('sources 50k', sources_payload(50000)),
+        ('declaration 100 apps', declaration_payload(100)),
+        ('declaration 1000 apps', declaration_payload(1000)),
+    ]
+    backends = [get_json_backend(name) for name in ('orjson', 'ujson', 'json') if BACKENDS[name][0] is not None]
+
+    header = '{0:<24} {1:>10} {2:>14}'.format('payload', 'size (KB)', 'baseline (ms)')
+    for backend in backends:
+        header += ' {0:>14}'.format(backend.name + ' (ms)')
+    print(header)
+    for name, payload in payloads:
+        response = json.dumps(payload).encode('utf-8')
+        line = '{0:<24} {1:>10.0f} {2:>14.2f}'.format(
+            name, len(response) / 1024.0, best_of(baseline(payload, response), args.repeat)
+        )
+        for backend in backends:
+            line += ' {0:>14.2f}'.format(best_of(with_backend(backend, payload, response), args.repeat))
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
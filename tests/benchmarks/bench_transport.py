@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Latency of small requests against a local stand-in HTTPS server.
+
+Compares a fresh ``open_url`` request per call, which is what the httpapi connection does, with
+the pooled keep-alive transport of the f5 httpapi plugin.
+
+Run from the repository root with ``python -m tests.benchmarks.bench_transport``.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from ansible.module_utils.urls import open_url
+
+try:
+    from plugins.plugin_utils.transport import ConnectionPool
+    from tests.units.common.server import StandInServer
+    from tests.units.common.server import create_self_signed_cert
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.transport import ConnectionPool
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.server import StandInServer
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.server import create_self_signed_cert
+
+
+def measure(func, count):
+    timings = []
+    for x in range(count):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return dict(
+        median=timings[len(timings) // 2] * 1000,
+        p90=timings[int(len(timings) * 0.9)] * 1000,
+        total=sum(timings),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        cert_file, key_file = create_self_signed_cert(tmpdir)
+        server = StandInServer(cert_file, key_file).start()
+        headers = {'Content-Type': 'application/json', 'Authorization': 'Bearer TOKEN'}
+        url = server.url + '/beacon/v1/sources'
+
+        def per_request():
+            open_url(url, headers=headers, method='GET', ca_path=cert_file, use_proxy=False).read()
+
+        pool = ConnectionPool(server.url, ca_path=cert_file, use_proxy=False)
+
+        def pooled():
+            pool.send('/beacon/v1/sources', method='GET', headers=headers)
+
+        results = [
+            ('connection per request', measure(per_request, args.requests), server.connections),
+        ]
+        opened = server.connections
+        results.append(('pooled keep-alive', measure(pooled, args.requests), server.connections - opened))
+        pool.close()
+        server.stop()
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('{0:<24} {1:>12} {2:>12} {3:>10} {4:>12}'.format('transport', 'median (ms)', 'p90 (ms)', 'total (s)', 'connections'))
+    for name, result, connections in results:
+        print('{0:<24} {1:>12.3f} {2:>12.3f} {3:>10.3f} {4:>12}'.format(
+            name, result['median'], result['p90'], result['total'], connections
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import datetime
+import json
+import os
+import ssl
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+def create_self_signed_cert(path, hostname='localhost'):
+    """Write a self signed certificate and key for ``hostname`` into ``path``."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname)])
+    now = datetime.datetime.utcnow()
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+        key.public_key()
+    ).serial_number(x509.random_serial_number()).not_valid_before(
+        now - datetime.timedelta(days=1)
+    ).not_valid_after(
+        now + datetime.timedelta(days=1)
+    ).add_extension(
+        x509.SubjectAlternativeName([x509.DNSName(hostname)]), critical=False
+    ).sign(key, hashes.SHA256())
+
+    cert_file = os.path.join(path, 'cert.pem')
+    key_file = os.path.join(path, 'key.pem')
+    with open(cert_file, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_file, 'wb') as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_file, key_file
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers every request with a small JSON document echoing the request, keeping connections alive."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append(dict(
+            method=self.command, path=self.path, headers=dict(self.headers), body=body
+        ))
+        status, payload = self.server.responses.pop(0) if self.server.responses else (200, {'status': 'ok'})
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local HTTPS server standing in for F5 Cloud Services.
+
+    Keeps track of received requests and of the number of accepted TCP connections. Responses can be
+    queued as ``(status, payload)`` tuples in ``responses``.
+    """
+    daemon_threads = True
+
+    def __init__(self, cert_file, key_file):
+        ThreadingHTTPServer.__init__(self, ('localhost', 0), StandInHandler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_file, key_file)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.requests = []
+        self.responses = []
+        self.connections = 0
+        self.thread = None
+
+    def get_request(self):
+        request = ThreadingHTTPServer.get_request(self)
+        self.connections += 1
+        return request
+
+    @property
+    def url(self):
+        return 'https://localhost:{0}'.format(self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, kwargs=dict(poll_interval=0.05))
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
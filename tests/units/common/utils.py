@@ -8,13 +8,20 @@ __metaclass__ = type
 
 import json
 import os
+import yaml
 
 from unittest.mock import Mock
 
+from ansible import constants as C
 from ansible.module_utils import basic
 from ansible.module_utils._text import to_bytes
 from ansible.module_utils.six import BytesIO
 
+try:
+    from plugins.httpapi import f5
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.httpapi import f5
+
 
 def set_module_args(args):
     if '_ansible_remote_tmp' not in args:
@@ -26,6 +33,18 @@ def set_module_args(args):
     basic._ANSIBLE_ARGS = to_bytes(args)
 
 
+def httpapi_plugin(connection, **options):
+    """Return the f5 httpapi plugin with its options set from DOCUMENTATION, the way the
+    httpapi connection loads it, overridden by ``options``."""
+    C.config.initialize_plugin_configuration_definitions(
+        'httpapi', 'f5', yaml.safe_load(f5.DOCUMENTATION)['options']
+    )
+    plugin = f5.HttpApi(connection)
+    plugin._load_name = 'f5'
+    plugin.set_options(direct=options)
+    return plugin
+
+
 def connection_response(name, path, status=200):
     file = os.path.join(path, name)
     with open(file, 'rb') as f:
@@ -34,3 +53,16 @@ def connection_response(name, path, status=200):
     response_mock.getcode.return_value = status
     return response_mock, response_data
 
+
+class FakeClock(object):
+    """Stand-in for ``time.time`` and ``time.sleep``, sleeping only moves the clock forward."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
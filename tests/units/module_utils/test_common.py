@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from unittest.mock import patch
+from unittest import TestCase
+
+try:
+    from plugins.module_utils.common import AnsibleF5Parameters
+    from plugins.module_utils.common import FieldMapper
+    from plugins.module_utils.common import PollBackoff
+    from tests.units.common.utils import FakeClock
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import AnsibleF5Parameters
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import FieldMapper
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import PollBackoff
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import FakeClock
+
+
+class Parameters(AnsibleF5Parameters):
+    api_map = {
+        'lastFeedTime': 'last_feed_time',
+        'tokenName': 'token_name',
+    }
+
+    returnables = [
+        'name',
+        'type',
+        'last_feed_time',
+        'token_name',
+    ]
+
+
+class UpperParameters(Parameters):
+    @property
+    def token_name(self):
+        return self._values['token_name'].upper()
+
+
+class TestFieldMapper(TestCase):
+    def test_map_resource(self):
+        mapper = FieldMapper(Parameters)
+
+        result = mapper(dict(name='foo', lastFeedTime='2020-02-27T15:49:48Z', tokenName='bar', extra=1))
+
+        assert mapper.compiled is True
+        assert result == dict(name='foo', last_feed_time='2020-02-27T15:49:48Z', token_name='bar')
+
+    def test_missing_values_are_omitted(self):
+        mapper = FieldMapper(Parameters, ['name', 'type'])
+
+        assert mapper(dict(name='foo', type=None)) == dict(name='foo')
+
+    def test_properties_fall_back_to_parameters(self):
+        mapper = FieldMapper(UpperParameters)
+
+        result = mapper(dict(name='foo', tokenName='bar'))
+
+        assert mapper.compiled is False
+        assert result == dict(name='foo', token_name='BAR')
+
+    def test_mappers_are_cached_per_class(self):
+        assert FieldMapper.for_class(Parameters) is FieldMapper.for_class(Parameters)
+        assert FieldMapper.for_class(Parameters, ['name']) is not FieldMapper.for_class(Parameters)
+
+
+class SetterParameters(AnsibleF5Parameters):
+    api_map = {
+        'tokenName': 'token_name',
+    }
+
+    api_attributes = [
+        'tokenName',
+        'description',
+    ]
+
+    @property
+    def token_name(self):
+        return self._values['token_name']
+
+    @token_name.setter
+    def token_name(self, value):
+        self._values['token_name'] = value.lower()
+
+
+class TestAnsibleF5Parameters(TestCase):
+    def test_update_uses_setters(self):
+        p = SetterParameters(params=dict(tokenName='FOO', description='bar'))
+
+        assert p.token_name == 'foo'
+        assert p.description == 'bar'
+        assert p._params == dict(tokenName='FOO', description='bar')
+
+    def test_dispatch_table_is_per_class(self):
+        SetterParameters(params=dict(tokenName='FOO'))
+        Parameters(params=dict(tokenName='FOO'))
+
+        assert SetterParameters._dispatch_table()['tokenName'] == ('token_name', True)
+        assert Parameters._dispatch_table()['tokenName'] == ('token_name', False)
+
+    def test_missing_attributes_do_not_grow_values(self):
+        p = Parameters(params=dict(name='foo'))
+        size = len(p._values)
+
+        assert p.missing is None
+        assert len(p._values) == size
+
+    def test_api_params(self):
+        p = SetterParameters(params=dict(tokenName='FOO'))
+
+        assert p.api_params() == dict(tokenName='foo')
+
+
+class TestPollBackoff(TestCase):
+    def test_delays_double_up_to_the_deadline(self):
+        clock = FakeClock()
+        with patch('time.time', clock.time), patch('time.sleep', clock.sleep), \
+                patch('random.uniform', lambda a, b: a):
+            backoff = PollBackoff(5, 2)
+            while backoff.sleep():
+                pass
+            assert backoff.elapsed == 5.0
+
+        assert clock.sleeps == [0.25, 0.5, 1.0, 1.0, 1.0, 1.0, 0.25]
@@ -8,25 +8,43 @@ __metaclass__ = type
 
 import os
 import json
+import shutil
+import tempfile
 
 from unittest.mock import Mock
+from unittest.mock import patch
 from unittest import TestCase
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import BytesIO
 
 try:
-    from plugins.httpapi.f5 import HttpApi
     from plugins.modules.beacon_declaration import Parameters
     from plugins.modules.beacon_declaration import ModuleManager
     from plugins.modules.beacon_declaration import ArgumentSpec
+    from plugins.modules.beacon_declaration import normalize
+    from plugins.modules.beacon_declaration import fingerprint
+    from plugins.modules.beacon_declaration import FingerprintStore
+    from plugins.modules.beacon_declaration import subtree
+    from plugins.modules.beacon_declaration import diff_trees
+    from plugins.module_utils.common import F5CollectionError
     from tests.units.common.utils import set_module_args
+    from tests.units.common.utils import httpapi_plugin
+    from tests.units.common.utils import FakeClock
     from tests.units.common.utils import connection_response
 except ImportError:
-    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import HttpApi
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import Parameters
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import ModuleManager
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import ArgumentSpec
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import normalize
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import fingerprint
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import FingerprintStore
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import subtree
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_declaration import diff_trees
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import F5CollectionError
     from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import set_module_args
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import httpapi_plugin
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import FakeClock
     from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import connection_response
 
 
@@ -52,6 +70,12 @@ def load_fixture(name):
     return data
 
 
+def empty_declaration():
+    response = Mock()
+    response.getcode.return_value = 200
+    return response, BytesIO(b'{"action": "get", "declaration": []}')
+
+
 class TestParameters(TestCase):
     def test_module_parameters(self):
         args = dict(
@@ -70,8 +94,7 @@ class TestManager(TestCase):
     def setUp(self):
         self.spec = ArgumentSpec()
         self.connection_mock = Mock()
-        self.f5cs_plugin = HttpApi(self.connection_mock)
-        self.f5cs_plugin._load_name = 'httpapi'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock)
 
     def test_deploy_declaration(self, *args):
         declaration = load_fixture('test_declaration.json')
@@ -81,6 +104,7 @@ class TestManager(TestCase):
         ))
 
         self.connection_mock.send.side_effect = [
+            empty_declaration(),
             connection_response('load_declare_response.json', fixture_path),
             connection_response('load_task_status.json', fixture_path),
             connection_response('load_task_status.json', fixture_path)
@@ -97,3 +121,430 @@ class TestManager(TestCase):
         results = mm.exec_module()
         assert results['changed'] is True
         assert results['content'] == declaration
+
+    def test_deploy_declaration_drops_cached_facts(self, *args):
+        declaration = load_fixture('test_declaration.json')
+        set_module_args(dict(
+            content=declaration,
+            state='present'
+        ))
+
+        self.connection_mock.send.side_effect = [
+            empty_declaration(),
+            connection_response('load_declare_response.json', fixture_path),
+            connection_response('load_task_status.json', fixture_path),
+        ]
+        self.f5cs_plugin.cache_facts('sources', {'sources': []}, 60)
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+        mm.exec_module()
+
+        assert self.f5cs_plugin.get_cached_facts('sources') is None
+
+    def test_deploy_declaration_without_waiting(self, *args):
+        declaration = load_fixture('test_declaration.json')
+        set_module_args(dict(
+            content=declaration,
+            preferred_account_id='a-aaQsw6MlaD',
+            wait=False
+        ))
+
+        self.connection_mock.send.side_effect = [
+            empty_declaration(),
+            connection_response('load_declare_response.json', fixture_path),
+        ]
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+
+        results = mm.exec_module()
+        assert results['changed'] is True
+        assert results['task_references'] == [dict(
+            task_reference='https://api.cloudservices.f5.com/beacon/v1/declare-task/244925',
+            preferred_account_id='a-aaQsw6MlaD',
+        )]
+        assert 'polls' not in results
+        assert self.connection_mock.send.call_count == 2
+
+    def test_invalid_json_content(self, *args):
+        set_module_args(dict(
+            content='{"declaration": [ {"a": 1}, ]}',
+            fingerprint_cache='/nonexistent',
+        ))
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+
+        with self.assertRaises(F5CollectionError) as err:
+            ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+        assert 'could not be converted into valid json' in str(err.exception)
+        assert self.connection_mock.send.call_count == 0
+
+    def test_deploy_declaration_already_live(self, *args):
+        declaration = load_fixture('test_declaration.json')
+        set_module_args(dict(
+            content=declaration,
+            state='present'
+        ))
+
+        self.connection_mock.send.side_effect = [
+            connection_response('load_declare_get_response.json', fixture_path),
+        ]
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+
+        results = mm.exec_module()
+        assert results['changed'] is False
+        assert self.connection_mock.send.call_count == 1
+        assert json.loads(self.connection_mock.send.call_args[0][1]) == {'action': 'get'}
+
+    def test_deploy_changed_declaration_in_check_mode(self, *args):
+        declaration = load_fixture('test_declaration.json')
+        declaration = json.loads(json.dumps(declaration))
+        declaration['declaration'][0]['application']['labels']['Environment'] = 'Production'
+        set_module_args(dict(
+            content=declaration,
+            state='present',
+            _ansible_check_mode=True
+        ))
+
+        self.connection_mock.send.side_effect = [
+            connection_response('load_declare_get_response.json', fixture_path),
+        ]
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+
+        results = mm.exec_module()
+        assert results['changed'] is True
+        assert self.connection_mock.send.call_count == 1
+
+
+class TestNormalize(TestCase):
+    def test_defaults_and_order_are_ignored(self):
+        want = load_fixture('test_declaration.json')['declaration']
+        have = load_fixture('load_declare_get_response.json')['declaration']
+
+        assert want != have
+        assert normalize(want) == normalize(have)
+
+    def test_values_are_compared(self):
+        want = [{'application': {'name': 'foo', 'labels': {'a': 'b'}}}]
+        have = [{'application': {'name': 'foo', 'labels': {'a': 'c'}}}]
+
+        assert normalize(want) != normalize(have)
+
+    def test_unnamed_lists_keep_their_order(self):
+        assert normalize([{'tags': 'b'}, {'tags': 'a'}]) == [{'tags': 'b'}, {'tags': 'a'}]
+        assert normalize([0, 1]) == [0, 1]
+
+
+class TestFingerprintCache(TestCase):
+    def setUp(self):
+        self.spec = ArgumentSpec()
+        self.connection_mock = Mock()
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _manager(self, **args):
+        args.update(
+            content=load_fixture('test_declaration.json'),
+            fingerprint_cache=self.tmpdir,
+        )
+        set_module_args(args)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        return ModuleManager(module=module, client=self.f5cs_plugin)
+
+    def test_fingerprint_is_canonical(self):
+        want = load_fixture('test_declaration.json')['declaration']
+        have = load_fixture('load_declare_get_response.json')['declaration']
+
+        assert fingerprint(want) == fingerprint(have)
+        assert fingerprint(want) != fingerprint(want[:0])
+
+    def test_store_expires(self):
+        store = FingerprintStore(os.path.join(self.tmpdir, 'store'))
+        store.write('a-aaQsw6MlaD', 'abc')
+
+        assert store.read('a-aaQsw6MlaD', 60) == 'abc'
+        assert store.read('a-aaQsw6MlaD', 0) is None
+        assert store.read(None, 60) is None
+
+        store.delete('a-aaQsw6MlaD')
+        assert store.read('a-aaQsw6MlaD', 60) is None
+
+    def test_matching_fingerprint_skips_requests(self):
+        self.connection_mock.send.side_effect = [
+            connection_response('load_declare_get_response.json', fixture_path),
+        ]
+        assert self._manager().exec_module()['changed'] is False
+
+        results = self._manager().exec_module()
+
+        assert results['changed'] is False
+        assert self.connection_mock.send.call_count == 1
+
+    def test_store_is_keyed_by_login(self):
+        store = FingerprintStore(self.tmpdir, 'https://api.cloudservices.f5.com user1@fakemail.net')
+        store.write(None, 'abc')
+
+        assert store.read(None, 60) == 'abc'
+        assert FingerprintStore(self.tmpdir, 'https://api.cloudservices.f5.com user2@fakemail.net').read(None, 60) is None
+
+    def test_deploy_stores_fingerprint(self):
+        self.connection_mock.send.side_effect = [
+            empty_declaration(),
+            connection_response('load_declare_response.json', fixture_path),
+            connection_response('load_task_status.json', fixture_path),
+        ]
+        assert self._manager().exec_module()['changed'] is True
+
+        assert FingerprintStore(self.tmpdir, self.f5cs_plugin.get_identity()).read(None, 60) == fingerprint(
+            load_fixture('test_declaration.json')['declaration']
+        )
+
+    def test_force_deploys(self):
+        FingerprintStore(self.tmpdir, self.f5cs_plugin.get_identity()).write(
+            None, fingerprint(load_fixture('test_declaration.json')['declaration'])
+        )
+        self.connection_mock.send.side_effect = [
+            connection_response('load_declare_response.json', fixture_path),
+            connection_response('load_task_status.json', fixture_path),
+        ]
+
+        results = self._manager(force=True).exec_module()
+
+        assert results['changed'] is True
+        assert json.loads(self.connection_mock.send.call_args_list[0][0][1])['action'] == 'deploy'
+
+
+class TestStructuralDiff(TestCase):
+    @staticmethod
+    def _diff(want, have):
+        return diff_trees(subtree(normalize(want)), subtree(normalize(have)))
+
+    @staticmethod
+    def _app(name, *components, **values):
+        application = dict(name=name, dependencies=list(components))
+        application.update(values)
+        return dict(metadata=dict(version='v1'), application=application)
+
+    def test_equal_declarations(self):
+        want = load_fixture('test_declaration.json')['declaration']
+        have = load_fixture('load_declare_get_response.json')['declaration']
+
+        assert self._diff(want, have) == []
+
+    def test_changes_are_keyed_by_name(self):
+        have = [
+            self._app('App1', dict(name='WAF', dependencies=[dict(name='Gateway'), dict(name='Data')])),
+            self._app('App2'),
+        ]
+        want = [
+            self._app('App3'),
+            self._app('App1', dict(name='WAF', dependencies=[dict(name='Data'), dict(name='Gateway', labels=dict(a='b'))])),
+        ]
+
+        assert sorted(self._diff(want, have)) == [
+            ('added', ('App3',)),
+            ('changed', ('App1', 'WAF', 'Gateway')),
+            ('removed', ('App2',)),
+        ]
+
+    def test_own_values_of_a_component(self):
+        have = [self._app('App1', dict(name='WAF', dependencies=[dict(name='Gateway')]))]
+        want = [self._app('App1', dict(name='WAF', description='x', dependencies=[dict(name='Gateway')]))]
+
+        assert self._diff(want, have) == [('changed', ('App1', 'WAF'))]
+
+    def test_duplicate_names_are_not_matched(self):
+        have = [self._app('App1'), self._app('App1', description='x')]
+        want = [self._app('App1')]
+
+        assert self._diff(want, have) == [('changed', ())]
+
+
+class TestDiffMode(TestCase):
+    def setUp(self):
+        self.spec = ArgumentSpec()
+        self.connection_mock = Mock()
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock)
+
+    @staticmethod
+    def _get_response(declaration):
+        response = Mock()
+        response.getcode.return_value = 200
+        return response, BytesIO(json.dumps(dict(action='get', declaration=declaration)).encode('utf-8'))
+
+    def _manager(self, content, **args):
+        args.update(content=content, _ansible_diff=True)
+        set_module_args(args)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        return ModuleManager(module=module, client=self.f5cs_plugin)
+
+    def test_full_declaration_is_deployed(self):
+        have = load_fixture('load_declare_get_response.json')['declaration']
+        removed = dict(application=dict(name='Removed_App'))
+        content = json.loads(json.dumps(load_fixture('test_declaration.json')))
+        content['declaration'][0]['application']['dependencies'][0]['description'] = 'Images'
+        content['declaration'].append(dict(application=dict(name='New_App')))
+
+        self.connection_mock.send.side_effect = [
+            self._get_response(have + [removed]),
+            connection_response('load_declare_response.json', fixture_path),
+            connection_response('load_task_status.json', fixture_path),
+        ]
+
+        results = self._manager(content).exec_module()
+
+        assert results['changed'] is True
+        assert results['diff'] == dict(prepared='~ Mobile_App/Static_Resources\n+ New_App\n- Removed_App\n')
+        assert json.loads(self.connection_mock.send.call_args_list[1][0][1]) == dict(content, action='deploy')
+
+    def test_unnamed_entries(self):
+        content = dict(declaration=[dict(metadata=dict(version='v1'))])
+
+        self.connection_mock.send.side_effect = [empty_declaration()]
+
+        results = self._manager(content, _ansible_check_mode=True).exec_module()
+
+        assert results['changed'] is True
+        assert results['diff'] == dict(prepared='~ (declaration)\n')
+        assert self.connection_mock.send.call_count == 1
+
+
+class TestTaskPolling(TestCase):
+    def setUp(self):
+        self.spec = ArgumentSpec()
+        self.connection_mock = Mock()
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock)
+        self.clock = FakeClock()
+        self.patches = [
+            patch('time.time', self.clock.time),
+            patch('time.sleep', self.clock.sleep),
+            patch('random.uniform', lambda a, b: b),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    @staticmethod
+    def _task_status(status):
+        response = Mock()
+        response.getcode.return_value = 200
+        return response, BytesIO(json.dumps(dict(status=status, error={})).encode('utf-8'))
+
+    def _manager(self, **args):
+        args.update(content=load_fixture('test_declaration.json'))
+        set_module_args(args)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        return ModuleManager(module=module, client=self.f5cs_plugin)
+
+    def test_poll_with_backoff(self):
+        self.connection_mock.send.side_effect = [
+            empty_declaration(),
+            connection_response('load_declare_response.json', fixture_path),
+            self._task_status('In Progress'),
+            self._task_status('In Progress'),
+            self._task_status('In Progress'),
+            self._task_status('In Progress'),
+            self._task_status('In Progress'),
+            self._task_status('Completed'),
+        ]
+        mm = self._manager(poll_interval=3)
+
+        results = mm.exec_module()
+
+        assert results['changed'] is True
+        assert results['polls'] == 6
+        assert self.clock.sleeps == [0.5, 1.0, 2.0, 3.0, 3.0]
+        assert results['elapsed'] == 9.5
+
+    def test_wait_adds_up_over_tasks(self):
+        self.connection_mock.send.side_effect = [
+            self._task_status('In Progress'),
+            self._task_status('Completed'),
+            self._task_status('In Progress'),
+            self._task_status('In Progress'),
+            self._task_status('Completed'),
+        ]
+        mm = self._manager()
+
+        mm.check_for_task('/beacon/v1/declare-task/1')
+        mm.check_for_task('/beacon/v1/declare-task/2')
+
+        assert mm.polls == 5
+        assert mm.elapsed == 2.0
+
+    def test_polls_of_unchanged_declaration_are_returned(self):
+        current = load_fixture('test_declaration.json')
+        response = Mock()
+        response.getcode.return_value = 200
+        self.connection_mock.send.side_effect = [
+            (response, BytesIO(b'{"taskReference": "/beacon/v1/declare-task/1"}')),
+            self._task_status('In Progress'),
+            (response, BytesIO(json.dumps(dict(status='Completed', task=current)).encode('utf-8'))),
+        ]
+        mm = self._manager()
+
+        results = mm.exec_module()
+
+        assert results['changed'] is False
+        assert results['polls'] == 2
+        assert results['elapsed'] == 0.5
+
+    def test_poll_timeout(self):
+        self.connection_mock.send.side_effect = [
+            empty_declaration(),
+            connection_response('load_declare_response.json', fixture_path)
+        ] + [self._task_status('In Progress') for x in range(10)]
+        mm = self._manager(timeout=4)
+
+        with self.assertRaises(F5CollectionError) as err:
+            mm.exec_module()
+
+        assert 'did not complete within 4 seconds' in str(err.exception)
+        assert "'In Progress' after 5 polls" in str(err.exception)
+        assert self.clock.sleeps == [0.5, 1.0, 2.0, 0.5]
+
+    def test_failed_task(self):
+        self.connection_mock.send.side_effect = [
+            empty_declaration(),
+            connection_response('load_declare_response.json', fixture_path),
+            self._task_status('Failed'),
+        ]
+        mm = self._manager()
+
+        with self.assertRaises(F5CollectionError):
+            mm.exec_module()
@@ -6,31 +6,47 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import gzip
+import hashlib
+import json
 import os
+import shutil
+import tempfile
 
 from unittest.mock import Mock
+from unittest.mock import patch
 from unittest import TestCase
 
+from ansible.errors import AnsibleConnectionFailure
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import BytesIO
+from ansible.module_utils.six import StringIO
+from ansible.module_utils.six.moves.urllib.error import HTTPError
 
 
 try:
-    from plugins.httpapi.f5 import HttpApi
     from plugins.modules.beacon_info import TokenManager
     from plugins.modules.beacon_info import SourcesManager
     from plugins.modules.beacon_info import Parameters
     from plugins.modules.beacon_info import ModuleManager
     from plugins.modules.beacon_info import ArgumentSpec
+    from plugins.modules.beacon_info import parse_time
+    from plugins.modules.beacon_info import SummaryManager
+    from plugins.module_utils.common import F5CollectionError
     from tests.units.common.utils import set_module_args
+    from tests.units.common.utils import httpapi_plugin
     from tests.units.common.utils import connection_response
 except ImportError:
-    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import HttpApi
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import TokenManager
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import SourcesManager
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import Parameters
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import ModuleManager
     from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import ArgumentSpec
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import parse_time
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_info import SummaryManager
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import F5CollectionError
     from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import set_module_args
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import httpapi_plugin
     from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import connection_response
 
 
@@ -41,8 +57,7 @@ class TestManager(TestCase):
     def setUp(self):
         self.spec = ArgumentSpec()
         self.connection_mock = Mock()
-        self.f5cs_plugin = HttpApi(self.connection_mock)
-        self.f5cs_plugin._load_name = 'httpapi'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock)
 
     def test_get_beacon_tokens(self):
         set_module_args(dict(
@@ -89,3 +104,552 @@ class TestManager(TestCase):
         assert results['sources'][0]['type'] == 'system'
         assert results['sources'][2]['token_name'] == 'SilverLine_BigIP_Token'
         assert results['sources'][5]['name'] == 'ip-10-0-0-105.ap-southeast-1.compute.internal'
+
+    @staticmethod
+    def _page(key, names):
+        response = Mock()
+        response.getcode.return_value = 200
+        items = [dict(name=x, type='bigip-system', tokenName='foo') for x in names]
+        return response, BytesIO(json.dumps({key: items}).encode('utf-8'))
+
+    def test_get_beacon_sources_paginated(self):
+        set_module_args(dict(
+            gather_subset=['sources'],
+            page_size=2
+        ))
+        self.connection_mock.send.side_effect = [
+            self._page('sources', ['d', 'b']),
+            self._page('sources', ['e', 'a']),
+            self._page('sources', ['c']),
+        ]
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        sm = SourcesManager(module=module, client=self.f5cs_plugin)
+        mm = ModuleManager(module=module)
+        mm.get_manager = Mock(return_value=sm)
+
+        results = mm.exec_module()
+
+        assert [x['name'] for x in results['sources']] == ['a', 'b', 'c', 'd', 'e']
+        urls = [x[0][0] for x in self.connection_mock.send.call_args_list]
+        assert urls == [
+            '/beacon/v1/sources?limit=2&offset=0',
+            '/beacon/v1/sources?limit=2&offset=2',
+            '/beacon/v1/sources?limit=2&offset=4',
+        ]
+
+    def test_get_beacon_tokens_paging_ignored_by_api(self):
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            page_size=2
+        ))
+        self.connection_mock.send.side_effect = [
+            self._page('tokens', ['b', 'a']),
+            self._page('tokens', ['b', 'a']),
+        ]
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        tm = TokenManager(module=module, client=self.f5cs_plugin)
+        mm = ModuleManager(module=module)
+        mm.get_manager = Mock(return_value=tm)
+
+        results = mm.exec_module()
+
+        assert [x['name'] for x in results['tokens']] == ['a', 'b']
+        assert self.connection_mock.send.call_count == 2
+
+    def test_get_beacon_sources_without_paging(self):
+        set_module_args(dict(
+            gather_subset=['sources'],
+            page_size=0
+        ))
+        self.connection_mock.send.return_value = connection_response('load_beacon_sources.json', fixture_path)
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        sm = SourcesManager(module=module, client=self.f5cs_plugin)
+        mm = ModuleManager(module=module)
+        mm.get_manager = Mock(return_value=sm)
+
+        results = mm.exec_module()
+
+        assert len(results['sources']) > 0
+        assert self.connection_mock.send.call_args[0][0] == '/beacon/v1/sources'
+
+    def _dispatch(self, responses):
+        def send(url, data, **kwargs):
+            response = responses[url.split('?')[0]]
+            if isinstance(response, Exception):
+                raise response
+            return connection_response(response, fixture_path)
+        return send
+
+    def test_get_all_concurrently(self):
+        set_module_args(dict(
+            gather_subset=['all']
+        ))
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/telemetry-token': 'load_beacon_tokens.json',
+            '/beacon/v1/sources': 'load_beacon_sources.json',
+        })
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+        self.f5cs_plugin.send_requests = Mock(wraps=self.f5cs_plugin.send_requests)
+
+        results = mm.exec_module()
+
+        assert results['queried'] is True
+        assert results['tokens'][0]['name'] == 'BIGIP Azure'
+        assert results['sources'][5]['name'] == 'ip-10-0-0-105.ap-southeast-1.compute.internal'
+        assert self.f5cs_plugin.send_requests.call_count == 1
+        assert len(self.f5cs_plugin.send_requests.call_args[0][0]) == 2
+
+    def test_get_all_first_error_is_raised(self):
+        set_module_args(dict(
+            gather_subset=['all']
+        ))
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/telemetry-token': HTTPError(
+                'http://f5cs.com', 404, '', {}, StringIO('{"errorMessage": "tokens"}')
+            ),
+            '/beacon/v1/sources': HTTPError(
+                'http://f5cs.com', 404, '', {}, StringIO('{"errorMessage": "sources"}')
+            ),
+        })
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+
+        with self.assertRaises(F5CollectionError) as err:
+            mm.exec_module()
+        assert 'sources' in str(err.exception)
+
+    def _sources_manager(self, **args):
+        args['gather_subset'] = ['sources']
+        set_module_args(args)
+        self.connection_mock.send.return_value = connection_response('load_beacon_sources.json', fixture_path)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        sm = SourcesManager(module=module, client=self.f5cs_plugin)
+        mm = ModuleManager(module=module)
+        mm.get_manager = Mock(return_value=sm)
+        return mm
+
+    def test_filter_sources(self):
+        mm = self._sources_manager(filters=dict(
+            name='*.lab5.*',
+            token_name='SilverLine_BigIP_Token',
+        ))
+
+        results = mm.exec_module()
+
+        assert [x['name'] for x in results['sources']] == [
+            'bit1003.lab5.defenselabs.net', 'bit3.lab5.defense.net'
+        ]
+
+    def test_filter_sources_by_last_feed_time(self):
+        mm = self._sources_manager(filters=dict(
+            type='bigip-system',
+            last_feed_after='2020-02-20',
+            last_feed_before='2020-02-27T15:45:00Z',
+        ))
+
+        results = mm.exec_module()
+
+        assert [x['name'] for x in results['sources']] == [
+            'bit1003.lab5.defenselabs.net',
+            'ip-10-0-0-105.ap-southeast-1.compute.internal',
+            'waf3nic.openstack.grubernet.org',
+            'waf4nic.openstack.grubernet.org',
+        ]
+
+    def test_fields_projection(self):
+        mm = self._sources_manager(fields=['last_feed_time'])
+
+        results = mm.exec_module()
+
+        assert len(results['sources']) == 8
+        assert results['sources'][0] == dict(
+            name='NicoM-BeaconDemo-ubuntu-NGINX-az1-01', last_feed_time='2020-01-23T08:44:50Z'
+        )
+
+    def test_filters_not_applicable_are_ignored(self):
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            filters=dict(name='Nico*', type='bigip-system'),
+            fields=['source_count', 'type'],
+        ))
+        self.connection_mock.send.return_value = connection_response('load_beacon_tokens.json', fixture_path)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        tm = TokenManager(module=module, client=self.f5cs_plugin)
+        mm = ModuleManager(module=module)
+        mm.get_manager = Mock(return_value=tm)
+
+        results = mm.exec_module()
+
+        assert results['tokens'] == [
+            dict(name='NicoBIG_IP', source_count=0),
+            dict(name='Nico_NGINX', source_count=0),
+        ]
+
+    def test_parse_time(self):
+        assert parse_time('2020-02-27T15:49:48.123Z') == '2020-02-27T15:49:48'
+        assert parse_time('2020-02-27 15:49') == '2020-02-27T15:49:00'
+        assert parse_time('2020-02-27') == '2020-02-27T00:00:00'
+        with patch('time.time', return_value=1582818588):
+            assert parse_time('1d') == '2020-02-26T15:49:48'
+        with self.assertRaises(F5CollectionError):
+            parse_time('yesterday')
+
+    def test_results_are_cached(self):
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            cache_ttl=60
+        ))
+        self.connection_mock.send.side_effect = [
+            connection_response('load_beacon_tokens.json', fixture_path),
+            connection_response('load_beacon_tokens.json', fixture_path),
+        ]
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+
+        first = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+        second = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+        assert first == second
+        assert self.connection_mock.send.call_count == 1
+
+        self.f5cs_plugin.invalidate_facts()
+        ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+        assert self.connection_mock.send.call_count == 2
+
+    def test_cache_key_includes_filters(self):
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            cache_ttl=60,
+            filters=dict(name='Nico*')
+        ))
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        self.f5cs_plugin.cache_facts(
+            ModuleManager(module=module).get_cache_key(['tokens']), dict(tokens=[], queried=True), 60
+        )
+        self.connection_mock.send.return_value = connection_response('load_beacon_tokens.json', fixture_path)
+
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            cache_ttl=60,
+        ))
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        results = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+        assert len(results['tokens']) == 9
+
+    def _delta_manager(self, names, **args):
+        args['gather_subset'] = ['sources']
+        set_module_args(args)
+        self.connection_mock.send.return_value = self._page('sources', names)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        return ModuleManager(module=module, client=self.f5cs_plugin)
+
+    def test_delta_from_state_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'beacon.state')
+
+            results = self._delta_manager(['b', 'a'], state_file=path).exec_module()
+
+            assert 'sources' not in results
+            assert [x['name'] for x in results['delta']['sources']['added']] == ['a', 'b']
+            assert results['delta']['sources']['counts'] == dict(added=2, changed=0, removed=0, unchanged=0)
+            with open(path) as f:
+                assert json.load(f) == results['state']
+
+            self.connection_mock.send.return_value = self._page('sources', ['c', 'b'])
+            results = self._delta_manager(['c', 'b'], state_file=path).exec_module()
+
+            delta = results['delta']['sources']
+            assert [x['name'] for x in delta['added']] == ['c']
+            assert delta['removed'] == ['a']
+            assert delta['changed'] == []
+            assert delta['counts'] == dict(added=1, changed=0, removed=1, unchanged=1)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_delta_since_state(self):
+        state = self._delta_manager(['a', 'b'], since_state={}).exec_module()['state']
+        state['sources']['b'] = '0000000000000000'
+        state['tokens'] = {'foo': '0000000000000000'}
+
+        results = self._delta_manager(['a', 'b'], since_state=state).exec_module()
+
+        assert [x['name'] for x in results['delta']['sources']['changed']] == ['b']
+        assert results['delta']['sources']['counts']['unchanged'] == 1
+        assert 'tokens' not in results['delta']
+        assert results['state']['tokens'] == {'foo': '0000000000000000'}
+
+    def test_delta_invalid_state_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'beacon.state')
+            with open(path, 'w') as f:
+                f.write('not a state')
+
+            with self.assertRaises(F5CollectionError):
+                self._delta_manager(['a'], state_file=path).exec_module()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_export_to_dest(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'beacon.ndjson.gz')
+            set_module_args(dict(
+                gather_subset=['all'],
+                page_size=2,
+                dest=path,
+            ))
+            pages = {
+                '/beacon/v1/sources?limit=2&offset=0': self._page('sources', ['d', 'b']),
+                '/beacon/v1/sources?limit=2&offset=2': self._page('sources', ['a']),
+                '/beacon/v1/telemetry-token?limit=2&offset=0': self._page('tokens', ['t']),
+            }
+            self.connection_mock.send.side_effect = lambda url, data, **kwargs: pages[url]
+            module = AnsibleModule(
+                argument_spec=self.spec.argument_spec,
+                supports_check_mode=self.spec.supports_check_mode
+            )
+
+            results = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+            assert results['counts'] == dict(sources=3, tokens=1)
+            assert results['dest'] == path
+            with open(path, 'rb') as f:
+                assert results['checksum'] == hashlib.sha256(f.read()).hexdigest()
+            with gzip.open(path, 'rt') as f:
+                lines = [json.loads(x) for x in f]
+            assert [(x['subset'], x['name']) for x in lines] == [
+                ('sources', 'd'), ('sources', 'b'), ('tokens', 't'), ('sources', 'a')
+            ]
+            assert os.listdir(tmpdir) == ['beacon.ndjson.gz']
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_export_failure_leaves_no_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'beacon.ndjson')
+            set_module_args(dict(
+                gather_subset=['sources'],
+                page_size=1,
+                dest=path,
+            ))
+            self.connection_mock.send.side_effect = [
+                self._page('sources', ['a']),
+                HTTPError('http://f5cs.com', 404, '', {}, StringIO('{"errorMessage": "ERROR"}')),
+            ]
+            module = AnsibleModule(
+                argument_spec=self.spec.argument_spec,
+                supports_check_mode=self.spec.supports_check_mode
+            )
+
+            with self.assertRaises(F5CollectionError):
+                ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+            assert os.listdir(tmpdir) == []
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_get_summary(self):
+        set_module_args(dict(
+            gather_subset=['summary'],
+            stale_after='1h',
+            return_stale=True,
+            fields=['last_feed_time'],
+        ))
+        self.connection_mock.send.return_value = connection_response('load_beacon_sources.json', fixture_path)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        mm = ModuleManager(module=module, client=self.f5cs_plugin)
+
+        # 2020-02-27T16:00:00Z
+        with patch('time.time', return_value=1582819200):
+            results = mm.exec_module()
+
+        summary = results['summary']
+        assert 'sources' not in results
+        assert summary['stale_before'] == '2020-02-27T15:00:00Z'
+        assert summary['total'] == dict(
+            count=8,
+            stale=4,
+            buckets={'15m': 2, '1h': 2, '1d': 0, '7d': 2, 'older': 2, 'never': 0},
+            oldest='2020-01-23T08:44:50Z',
+            newest='2020-02-27T15:49:48Z',
+        )
+        assert [(x['type'], x['token_name'], x['count']) for x in summary['groups']] == [
+            ('bigip-system', 'BIGIP Azure', 1),
+            ('bigip-system', 'Shahn_BIGIP', 1),
+            ('bigip-system', 'SilverLine_BigIP_Token', 2),
+            ('bigip-system', 'tmos_cloudinit_demo', 2),
+            ('system', '', 2),
+        ]
+        assert summary['groups'][4]['stale'] == 2
+        assert summary['stale'][0] == dict(
+            name='NicoM-BeaconDemo-ubuntu-NGINX-az1-01', last_feed_time='2020-01-23T08:44:50Z'
+        )
+        assert [x['name'] for x in summary['stale']][2:] == [
+            'waf3nic.openstack.grubernet.org', 'waf4nic.openstack.grubernet.org'
+        ]
+
+    def test_summary_shares_the_sources_pages(self):
+        set_module_args(dict(
+            gather_subset=['summary', 'sources', 'tokens'],
+            account_ids=['a-aaAAAAAAAA', 'a-aaBBBBBBBB'],
+        ))
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/telemetry-token': 'load_beacon_tokens.json',
+            '/beacon/v1/sources': 'load_beacon_sources.json',
+        })
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+
+        results = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+        for account in results['accounts'].values():
+            assert len(account['sources']) == 8
+            assert account['summary']['total']['count'] == 8
+            assert account['tokens'][0]['name'] == 'BIGIP Azure'
+        assert [x[0][0].split('?')[0] for x in self.connection_mock.send.call_args_list].count('/beacon/v1/sources') == 2
+
+    def test_summary_is_not_part_of_all(self):
+        set_module_args(dict(
+            gather_subset=['all']
+        ))
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        mm = ModuleManager(module=module)
+        mm.handle_all_keyword()
+
+        assert mm.filter_excluded_facts() == ['sources', 'tokens']
+
+    def test_summary_sources_never_fed(self):
+        set_module_args(dict(
+            gather_subset=['summary']
+        ))
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        sm = SummaryManager(module=module, client=self.f5cs_plugin)
+
+        sm.process_page([dict(name='foo', type='system')])
+
+        total = sm.results()['summary']['total']
+        assert total['buckets']['never'] == 1
+        assert total['stale'] == 1
+        assert total['oldest'] is None
+
+    def test_get_multiple_accounts(self):
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            account_ids=['a-aaAAAAAAAA', 'a-aaBBBBBBBB', 'a-aaCCCCCCCC', 'a-aaAAAAAAAA', 'a-aaCCCCCCCC'],
+            cache_ttl=60,
+        ))
+        pages = {
+            'a-aaAAAAAAAA': ['a', 'b'],
+            'a-aaBBBBBBBB': ['c'],
+        }
+
+        def send(url, data, headers=None, **kwargs):
+            account_id = headers['X-F5aaS-Preferred-Account-Id']
+            if account_id not in pages:
+                raise HTTPError('http://f5cs.com', 403, '', {}, StringIO('{"errorMessage": "Forbidden"}'))
+            return self._page('tokens', pages[account_id])
+
+        self.connection_mock.send.side_effect = send
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+        self.f5cs_plugin.send_requests = Mock(wraps=self.f5cs_plugin.send_requests)
+
+        results = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+        accounts = results['accounts']
+        assert results['queried'] is True
+        assert [x['name'] for x in accounts['a-aaAAAAAAAA']['tokens']] == ['a', 'b']
+        assert [x['name'] for x in accounts['a-aaBBBBBBBB']['tokens']] == ['c']
+        assert accounts['a-aaCCCCCCCC']['failed'] is True
+        assert 'Forbidden' in accounts['a-aaCCCCCCCC']['msg']
+        assert results['failed_accounts'] == ['a-aaCCCCCCCC']
+        assert self.f5cs_plugin.send_requests.call_count == 1
+        assert len(self.f5cs_plugin.send_requests.call_args[0][0]) == 3
+        assert self.f5cs_plugin.get_cached_facts(
+            ModuleManager(module=module).get_cache_key(['tokens']), account_id='a-aaBBBBBBBB'
+        ) == accounts['a-aaBBBBBBBB']
+        assert self.f5cs_plugin.get_cached_facts(
+            ModuleManager(module=module).get_cache_key(['tokens']), account_id='a-aaCCCCCCCC'
+        ) is None
+
+    def test_connection_failure_of_last_account(self):
+        set_module_args(dict(
+            gather_subset=['tokens'],
+            account_ids=['a-aaAAAAAAAA', 'a-aaBBBBBBBB'],
+            page_size=1,
+        ))
+
+        def send(url, data, headers=None, **kwargs):
+            if headers['X-F5aaS-Preferred-Account-Id'] == 'a-aaBBBBBBBB':
+                return self._page('tokens', [])
+            if 'offset=1' in url:
+                raise AnsibleConnectionFailure('Server error 500')
+            return self._page('tokens', ['a'])
+
+        self.connection_mock.send.side_effect = send
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode
+        )
+
+        results = ModuleManager(module=module, client=self.f5cs_plugin).exec_module()
+
+        accounts = results['accounts']
+        assert accounts['a-aaAAAAAAAA']['failed'] is True
+        assert 'Server error 500' in accounts['a-aaAAAAAAAA']['msg']
+        assert accounts['a-aaBBBBBBBB']['tokens'] == []
+        assert results['failed_accounts'] == ['a-aaAAAAAAAA']
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+
+from unittest.mock import Mock
+from unittest.mock import patch
+from unittest import TestCase
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import BytesIO
+
+try:
+    from plugins.modules.beacon_task_wait import ModuleManager
+    from plugins.modules.beacon_task_wait import ArgumentSpec
+    from plugins.module_utils.common import F5CollectionError
+    from tests.units.common.utils import set_module_args
+    from tests.units.common.utils import httpapi_plugin
+    from tests.units.common.utils import FakeClock
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_task_wait import ModuleManager
+    from ansible_collections.f5networks.f5_beacon.plugins.modules.beacon_task_wait import ArgumentSpec
+    from ansible_collections.f5networks.f5_beacon.plugins.module_utils.common import F5CollectionError
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import set_module_args
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import httpapi_plugin
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import FakeClock
+
+
+class TestManager(TestCase):
+    def setUp(self):
+        self.spec = ArgumentSpec()
+        self.connection_mock = Mock()
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock)
+        self.clock = FakeClock()
+        self.patches = [
+            patch('time.time', self.clock.time),
+            patch('time.sleep', self.clock.sleep),
+            patch('random.uniform', lambda a, b: b),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _dispatch(self, statuses):
+        self.requests = []
+
+        def send(url, data, **kwargs):
+            self.requests.append((url, kwargs['headers'].get('X-F5aaS-Preferred-Account-Id')))
+            status = statuses[url].pop(0)
+            if isinstance(status, Exception):
+                raise status
+            response = Mock()
+            if isinstance(status, int):
+                response.getcode.return_value = status
+                return response, BytesIO(b'{"message": "Not found"}')
+            response.getcode.return_value = 200
+            error = dict(message='Invalid declaration' if status == 'Failed' else '', errors=[])
+            return response, BytesIO(json.dumps(dict(status=status, error=error)).encode('utf-8'))
+        return send
+
+    def _manager(self, **args):
+        set_module_args(args)
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+        return ModuleManager(module=module, client=self.f5cs_plugin)
+
+    def test_poll_tasks_together(self):
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/declare-task/1': ['In Progress', 'Completed'],
+            '/beacon/v1/declare-task/2': ['In Progress', 'In Progress', 'In Progress', 'Completed'],
+        })
+        mm = self._manager(
+            tasks=[
+                'https://api.cloudservices.f5.com/beacon/v1/declare-task/1',
+                dict(task_reference='/beacon/v1/declare-task/2', preferred_account_id='a-aaQsw6MlaD'),
+            ],
+            preferred_account_id='a-aaSXXdAYYY2',
+            poll_interval=1,
+        )
+        self.f5cs_plugin.send_requests = Mock(wraps=self.f5cs_plugin.send_requests)
+
+        results = mm.exec_module()
+
+        assert results['changed'] is False
+        assert results['polls'] == 4
+        assert self.clock.sleeps == [0.5, 1.0, 1.0]
+        assert results['elapsed'] == 2.5
+        assert [x['status'] for x in results['tasks']] == ['Completed', 'Completed']
+        assert [x['polls'] for x in results['tasks']] == [2, 4]
+        assert results['tasks'][0]['elapsed'] == 0.5
+        assert self.f5cs_plugin.send_requests.call_count == 4
+        assert len(self.f5cs_plugin.send_requests.call_args_list[0][0][0]) == 2
+        assert ('/beacon/v1/declare-task/1', 'a-aaSXXdAYYY2') in self.requests
+        assert ('/beacon/v1/declare-task/2', 'a-aaQsw6MlaD') in self.requests
+        assert mm.failures() is None
+
+    def test_failed_and_unknown_tasks(self):
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/declare-task/1': ['Failed'],
+            '/beacon/v1/declare-task/2': [404],
+            '/beacon/v1/declare-task/3': ['Completed'],
+        })
+        mm = self._manager(tasks=[
+            '/beacon/v1/declare-task/1',
+            '/beacon/v1/declare-task/2',
+            '/beacon/v1/declare-task/3',
+        ])
+
+        results = mm.exec_module()
+
+        assert results['polls'] == 1
+        assert self.clock.sleeps == []
+        assert [x['status'] for x in results['tasks']] == ['Failed', 'Error', 'Completed']
+        assert results['tasks'][0]['error']['message'] == 'Invalid declaration'
+        assert results['tasks'][1]['error'] == {'message': 'Not found'}
+        assert mm.failures() == (
+            '2 of 3 tasks did not complete: /beacon/v1/declare-task/1 (Failed), /beacon/v1/declare-task/2 (Error)'
+        )
+
+    def test_connection_failure_of_last_task(self):
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/declare-task/1': ['Completed'],
+            '/beacon/v1/declare-task/2': ['In Progress', AnsibleConnectionFailure('Connection reset')],
+        })
+        mm = self._manager(tasks=['/beacon/v1/declare-task/1', '/beacon/v1/declare-task/2'])
+
+        results = mm.exec_module()
+
+        assert [x['status'] for x in results['tasks']] == ['Completed', 'Error']
+        assert 'Connection reset' in results['tasks'][1]['error']
+
+    def test_timeout(self):
+        self.connection_mock.send.side_effect = self._dispatch({
+            '/beacon/v1/declare-task/1': ['In Progress' for x in range(10)],
+        })
+        mm = self._manager(tasks=['/beacon/v1/declare-task/1'], timeout=4)
+
+        results = mm.exec_module()
+
+        task = results['tasks'][0]
+        assert task['timed_out'] is True
+        assert task['status'] == 'In Progress'
+        assert task['polls'] == 5
+        assert self.clock.sleeps == [0.5, 1.0, 2.0, 0.5]
+        assert 'timed out' in mm.failures()
+
+    def test_invalid_task(self):
+        mm = self._manager(tasks=[dict(preferred_account_id='a-aaQsw6MlaD')])
+
+        with self.assertRaises(F5CollectionError):
+            mm.exec_module()
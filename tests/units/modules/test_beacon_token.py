@@ -84,3 +84,23 @@ class TestManager(TestCase):
         assert results['changed'] is True
         assert results['name'] == 'foo'
         assert results['description'] == 'token by ansible'
+
+    def test_create_token_drops_cached_facts(self, *args):
+        set_module_args(dict(
+            name='foo',
+            preferred_account_id='a-aaQsw6MlaD',
+        ))
+
+        module = AnsibleModule(
+            argument_spec=self.spec.argument_spec,
+            supports_check_mode=self.spec.supports_check_mode,
+        )
+
+        client = Mock()
+        client.post.return_value = dict(code=200, contents={})
+        mm = ModuleManager(module=module, client=client)
+        mm.exists = Mock(return_value=False)
+
+        results = mm.exec_module()
+        assert results['changed'] is True
+        client.invalidate_facts.assert_called_once_with(account_id='a-aaQsw6MlaD')
@@ -6,9 +6,18 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import gzip
 import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import yaml
 
 from unittest.mock import Mock
+from unittest.mock import patch
 from unittest import TestCase
 
 from ansible.errors import AnsibleConnectionFailure
@@ -17,18 +26,38 @@ from ansible.module_utils.six.moves.urllib.error import HTTPError
 from ansible.module_utils.six import BytesIO, StringIO
 
 try:
-    from plugins.httpapi.f5 import HttpApi
+    from plugins.httpapi.f5 import DOCUMENTATION
     from plugins.httpapi.f5 import BASE_HEADERS
+    from plugins.httpapi.f5 import LOGIN_URL
+    from plugins.httpapi.f5 import RELOG_URL
+    from plugins.httpapi.f5 import LOGOUT_URL
+    from plugins.plugin_utils.token_cache import TokenCache
+    from tests.units.common.server import StandInServer
+    from tests.units.common.utils import httpapi_plugin
+    from tests.units.common.server import create_self_signed_cert
 except ImportError:
-    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import HttpApi
+    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import DOCUMENTATION
     from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import BASE_HEADERS
+    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import LOGIN_URL
+    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import RELOG_URL
+    from ansible_collections.f5networks.f5_beacon.plugins.httpapi.f5 import LOGOUT_URL
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.token_cache import TokenCache
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.server import StandInServer
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.utils import httpapi_plugin
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.server import create_self_signed_cert
 
 
 class TestF5CloudServicesHttpApi(TestCase):
     def setUp(self):
         self.connection_mock = Mock()
-        self.f5cs_plugin = HttpApi(self.connection_mock)
-        self.f5cs_plugin._load_name = 'httpapi'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+
+    def test_documentation_is_valid_yaml(self):
+        doc = yaml.safe_load(DOCUMENTATION)
+
+        assert doc['httpapi'] == 'f5'
+        assert doc['options']['compression']['type'] == 'bool'
+        assert 'Accept-Encoding' in ' '.join(doc['options']['compression']['description'])
 
     def test_login_raises_exception_when_username_and_password_are_not_provided(self):
         with self.assertRaises(AnsibleConnectionFailure) as res:
@@ -65,6 +94,109 @@ class TestF5CloudServicesHttpApi(TestCase):
         assert self.f5cs_plugin.token_timeout == 3600
         assert self.connection_mock._auth == {'Authorization': 'Bearer TOKENDATA'}
 
+    def test_identity_of_the_connection(self):
+        self.connection_mock._url = 'https://api.cloudservices.f5.com'
+        self.connection_mock.get_option.side_effect = lambda x: {'remote_user': 'foo@fakemail.net'}[x]
+
+        assert self.f5cs_plugin.get_identity() == 'https://api.cloudservices.f5.com foo@fakemail.net'
+
+    def test_response_is_decoded_with_fast_json_backend(self):
+        self.f5cs_plugin.set_option('json_backend', 'auto')
+        self.connection_mock.send.return_value = self._connection_response({'sources': [{'name': u'f\u00f6o'}]})
+
+        resp = self.f5cs_plugin.post('/testlink', data={'Test': 'Payload'})
+
+        assert resp == dict(code=200, contents={'sources': [{'name': u'f\u00f6o'}]})
+        assert json.loads(self.connection_mock.send.call_args[0][1]) == {'Test': 'Payload'}
+
+    def test_invalid_json_response_raises(self):
+        self.connection_mock.send.return_value = self._connection_response('<html>Bad Gateway</html>')
+
+        with self.assertRaises(ConnectionError) as res:
+            self.f5cs_plugin.get('/testlink')
+
+        assert 'Invalid JSON response: <html>Bad Gateway</html>' in str(res.exception)
+
+    def test_send_request_refreshes_expired_token(self):
+        self.f5cs_plugin.access_token = 'OLDTOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.f5cs_plugin.username = 'foo'
+        self.f5cs_plugin.token_expires_at = time.time() - 1
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'access_token': 'NEWTOKEN', 'expires_at': '3600'}),
+            self._connection_response({'FOO': 'BAR'}),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=200, contents={'FOO': 'BAR'})
+        assert self.connection_mock.send.call_args_list[0][0][0] == RELOG_URL
+        assert json.loads(self.connection_mock.send.call_args_list[0][0][1]) == {
+            'username': 'foo', 'refresh_token': 'REFRESHDATA'
+        }
+        assert self.f5cs_plugin.access_token == 'NEWTOKEN'
+        assert self.f5cs_plugin.token_expires_at > time.time() + 3000
+        assert self.connection_mock._auth == {'Authorization': 'Bearer NEWTOKEN'}
+
+    def test_send_request_does_not_refresh_valid_token(self):
+        self.f5cs_plugin.access_token = 'TOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.f5cs_plugin.token_expires_at = time.time() + 3600
+        self.connection_mock.send.return_value = self._connection_response({'FOO': 'BAR'})
+
+        self.f5cs_plugin.get('/testlink')
+
+        self.connection_mock.send.assert_called_once_with('/testlink', None, method='GET', headers=BASE_HEADERS)
+
+    def test_send_request_refreshes_token_and_replays_on_401(self):
+        self.f5cs_plugin.access_token = 'OLDTOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.f5cs_plugin.token_expires_at = time.time() + 3600
+        self.connection_mock.send.side_effect = [
+            HTTPError('http://f5cs.com', 401, '', {}, StringIO('{"errorMessage": "Unauthorized"}')),
+            self._connection_response({'access_token': 'NEWTOKEN', 'expires_at': '3600'}),
+            self._connection_response({'FOO': 'BAR'}),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=200, contents={'FOO': 'BAR'})
+        assert self.connection_mock.send.call_count == 3
+        assert self.connection_mock.send.call_args_list[2][0][0] == '/testlink'
+        assert self.f5cs_plugin.access_token == 'NEWTOKEN'
+
+    def test_send_request_replays_401_only_once(self):
+        self.f5cs_plugin.access_token = 'OLDTOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.connection_mock.send.side_effect = [
+            HTTPError('http://f5cs.com', 401, '', {}, StringIO('{"errorMessage": "Unauthorized"}')),
+            self._connection_response({'access_token': 'NEWTOKEN', 'expires_at': '3600'}),
+            HTTPError('http://f5cs.com', 401, '', {}, StringIO('{"errorMessage": "Unauthorized"}')),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=401, contents={'errorMessage': 'Unauthorized'})
+        assert self.connection_mock.send.call_count == 3
+
+    def test_rejected_refresh_token_falls_back_to_login(self):
+        self.f5cs_plugin.access_token = 'OLDTOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.f5cs_plugin.username = 'foo'
+        self.f5cs_plugin.token_expires_at = time.time() - 1
+        self.connection_mock.get_option.return_value = 'bar'
+        self.connection_mock.send.side_effect = [
+            HTTPError('http://f5cs.com', 401, '', {}, StringIO('{"errorMessage": "Unauthorized"}')),
+            self._connection_response({'access_token': 'NEWTOKEN', 'refresh_token': 'NEWREFRESH', 'expires_at': '3600'}),
+            self._connection_response({'FOO': 'BAR'}),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=200, contents={'FOO': 'BAR'})
+        assert self.connection_mock.send.call_args_list[1][0][0] == LOGIN_URL
+        assert self.f5cs_plugin.refresh_token == 'NEWREFRESH'
+
     def test_GET_header_update_with_account_id(self):
         self.connection_mock.send.return_value = self._connection_response(
             {'FOO': 'BAR', 'BAZ': 'FOO'}
@@ -181,3 +313,619 @@ class TestF5CloudServicesHttpApi(TestCase):
         response_text = json.dumps(response) if type(response) is dict else response
         response_data = BytesIO(response_text.encode() if response_text else ''.encode())
         return response_mock, response_data
+
+
+class TestF5CloudServicesRetries(TestCase):
+    def setUp(self):
+        self.connection_mock = Mock()
+        self.connection_mock._url = 'https://api.cloudservices.f5.com:443'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+        self.p1 = patch('time.sleep')
+        self.sleep_mock = self.p1.start()
+
+    def tearDown(self):
+        self.p1.stop()
+
+    @staticmethod
+    def _http_error(code, headers=None):
+        return HTTPError('http://f5cs.com', code, '', headers or {}, StringIO('{"errorMessage": "ERROR"}'))
+
+    def test_get_is_retried_on_transient_errors(self):
+        self.connection_mock.send.side_effect = [
+            self._http_error(503),
+            self._http_error(429),
+            TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'}),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=200, contents={'FOO': 'BAR'})
+        assert self.connection_mock.send.call_count == 3
+        assert self.sleep_mock.call_count == 2
+        assert 0.5 <= self.sleep_mock.call_args_list[0][0][0] <= 1.0
+        assert 1.0 <= self.sleep_mock.call_args_list[1][0][0] <= 2.0
+        retry_logs = [c[0][0] for c in self.connection_mock._log_messages.call_args_list if 'retry' in c[0][0]]
+        assert 'GET /testlink failed with status 503, retry 1/3' in retry_logs[0]
+        assert 'GET /testlink failed with status 429, retry 2/3' in retry_logs[1]
+
+    def test_retry_after_header_is_respected(self):
+        self.connection_mock.send.side_effect = [
+            self._http_error(429, {'Retry-After': '7'}),
+            TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'}),
+        ]
+
+        self.f5cs_plugin.get('/testlink')
+
+        self.sleep_mock.assert_called_once_with(7.0)
+
+    def test_throttling_is_returned_once_retries_are_exhausted(self):
+        self.f5cs_plugin.set_option('retries', 2)
+        self.connection_mock.send.side_effect = [self._http_error(429) for x in range(3)]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=429, contents={'errorMessage': 'ERROR'})
+        assert self.connection_mock.send.call_count == 3
+
+    def test_server_error_raises_once_retries_are_exhausted(self):
+        self.connection_mock.send.side_effect = [self._http_error(502) for x in range(4)]
+
+        with self.assertRaises(AnsibleConnectionFailure):
+            self.f5cs_plugin.get('/testlink')
+        assert self.connection_mock.send.call_count == 4
+
+    def test_retry_budget_limits_retries(self):
+        self.f5cs_plugin.set_option('retry_budget', 5.0)
+        self.connection_mock.send.side_effect = [
+            self._http_error(429, {'Retry-After': '3'}),
+            self._http_error(429, {'Retry-After': '6'}),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp['code'] == 429
+        assert self.connection_mock.send.call_count == 2
+        self.sleep_mock.assert_called_once_with(3.0)
+
+    def test_get_is_retried_on_connection_reset(self):
+        self.connection_mock.send.side_effect = [
+            ConnectionResetError(104, 'Connection reset by peer'),
+            TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'}),
+        ]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=200, contents={'FOO': 'BAR'})
+
+    def test_other_connection_errors_are_not_retried(self):
+        self.connection_mock.send.side_effect = AnsibleConnectionFailure('Could not connect to foo: timed out')
+
+        with self.assertRaises(AnsibleConnectionFailure):
+            self.f5cs_plugin.get('/testlink')
+        assert self.connection_mock.send.call_count == 1
+
+    def test_post_is_only_retried_when_throttled(self):
+        self.connection_mock.send.side_effect = [
+            self._http_error(429),
+            self._http_error(504),
+        ]
+
+        with self.assertRaises(AnsibleConnectionFailure):
+            self.f5cs_plugin.post('/beacon/v1/telemetry-token', data={'name': 'foo'})
+        assert self.connection_mock.send.call_count == 2
+
+    def test_declare_post_is_not_retried_by_default(self):
+        self.connection_mock.send.side_effect = [self._http_error(429)]
+
+        resp = self.f5cs_plugin.post('/beacon/v1/declare', data={'action': 'deploy'})
+
+        assert resp['code'] == 429
+        assert self.connection_mock.send.call_count == 1
+
+    def test_declare_post_is_retried_when_enabled(self):
+        self.f5cs_plugin.set_option('retry_declare', True)
+        self.connection_mock.send.side_effect = [
+            self._http_error(504),
+            TestF5CloudServicesHttpApi._connection_response({'taskReference': 'foo'}),
+        ]
+
+        resp = self.f5cs_plugin.post('/beacon/v1/declare', data={'action': 'deploy'})
+
+        assert resp == dict(code=200, contents={'taskReference': 'foo'})
+
+    def test_retries_can_be_disabled(self):
+        self.f5cs_plugin.set_option('retries', 0)
+        self.connection_mock.send.side_effect = [self._http_error(429)]
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp['code'] == 429
+        assert self.sleep_mock.call_count == 0
+
+
+class TestF5CloudServicesResponseCache(TestCase):
+    def setUp(self):
+        self.connection_mock = Mock()
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+
+    @staticmethod
+    def _connection_response(response, status=200, headers=None):
+        response_mock, response_data = TestF5CloudServicesHttpApi._connection_response(response, status)
+        response_mock.headers = headers or {}
+        return response_mock, response_data
+
+    def test_not_modified_response_is_served_from_cache(self):
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'sources': ['foo']}, headers={'ETag': '"abc"'}),
+            self._connection_response('', status=304),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/sources', account_id='a-aaQsw6MlaD')
+        resp = self.f5cs_plugin.get('/beacon/v1/sources', account_id='a-aaQsw6MlaD')
+
+        assert resp == dict(code=200, contents={'sources': ['foo']})
+        expected_header = {
+            'X-F5aaS-Preferred-Account-Id': 'a-aaQsw6MlaD',
+            'Content-Type': 'application/json',
+            'If-None-Match': '"abc"'
+        }
+        self.connection_mock.send.assert_called_with(
+            '/beacon/v1/sources', None, method='GET', headers=expected_header
+        )
+        assert 'If-None-Match' not in BASE_HEADERS
+
+    def test_not_modified_http_error_is_served_from_cache(self):
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'sources': ['foo']}, headers={'Last-Modified': 'Wed, 21 Oct 2020 07:28:00 GMT'}),
+            HTTPError('http://f5cs.com', 304, '', {}, StringIO('')),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/sources')
+        resp = self.f5cs_plugin.get('/beacon/v1/sources')
+
+        assert resp == dict(code=200, contents={'sources': ['foo']})
+        assert self.connection_mock.send.call_args[1]['headers']['If-Modified-Since'] == 'Wed, 21 Oct 2020 07:28:00 GMT'
+
+    def test_modified_response_replaces_cached_entry(self):
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'sources': ['foo']}, headers={'ETag': '"abc"'}),
+            self._connection_response({'sources': ['bar']}, headers={'ETag': '"def"'}),
+            self._connection_response('', status=304),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/sources')
+        self.f5cs_plugin.get('/beacon/v1/sources')
+        resp = self.f5cs_plugin.get('/beacon/v1/sources')
+
+        assert resp == dict(code=200, contents={'sources': ['bar']})
+        assert self.connection_mock.send.call_args[1]['headers']['If-None-Match'] == '"def"'
+
+    def test_cache_is_keyed_by_account(self):
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'sources': ['foo']}, headers={'ETag': '"abc"'}),
+            self._connection_response({'sources': ['bar']}),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/sources', account_id='a-aaQsw6MlaD')
+        self.f5cs_plugin.get('/beacon/v1/sources', account_id='a-bbQsw6MlaD')
+
+        assert 'If-None-Match' not in self.connection_mock.send.call_args[1]['headers']
+
+    def test_write_invalidates_cached_collection(self):
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'tokens': []}, headers={'ETag': '"abc"'}),
+            self._connection_response({'name': 'foo'}),
+            self._connection_response({'tokens': [{'name': 'foo'}]}),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/telemetry-token')
+        self.f5cs_plugin.post('/beacon/v1/telemetry-token', data={'name': 'foo'})
+        self.f5cs_plugin.get('/beacon/v1/telemetry-token')
+
+        self.connection_mock.send.assert_called_with(
+            '/beacon/v1/telemetry-token', None, method='GET', headers=BASE_HEADERS
+        )
+
+    def test_cache_can_be_disabled(self):
+        self.f5cs_plugin.set_option('response_cache_size', 0)
+        self.connection_mock.send.side_effect = [
+            self._connection_response({'sources': ['foo']}, headers={'ETag': '"abc"'}),
+            self._connection_response({'sources': ['foo']}, headers={'ETag': '"abc"'}),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/sources')
+        self.f5cs_plugin.get('/beacon/v1/sources')
+
+        self.connection_mock.send.assert_called_with('/beacon/v1/sources', None, method='GET', headers=BASE_HEADERS)
+
+
+class TestF5CloudServicesSendRequests(TestCase):
+    def setUp(self):
+        self.connection_mock = Mock()
+        self.connection_mock._url = 'https://api.cloudservices.f5.com:443'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+
+    def test_responses_are_returned_in_request_order(self):
+        def send(url, data, **kwargs):
+            time.sleep(0.05 if url == '/one' else 0)
+            return TestF5CloudServicesHttpApi._connection_response({'url': url, 'data': data})
+
+        self.connection_mock.send.side_effect = send
+
+        resp = self.f5cs_plugin.send_requests([
+            dict(method='GET', url='/one', account_id='a-aaQsw6MlaD'),
+            dict(method='post', url='/two', data={'name': 'foo'}),
+            dict(url='/three'),
+        ])
+
+        assert resp == [
+            dict(code=200, contents={'url': '/one', 'data': None}),
+            dict(code=200, contents={'url': '/two', 'data': '{"name": "foo"}'}),
+            dict(code=200, contents={'url': '/three', 'data': None}),
+        ]
+        headers = dict((c[0][0], c[1]['headers']) for c in self.connection_mock.send.call_args_list)
+        assert headers['/one']['X-F5aaS-Preferred-Account-Id'] == 'a-aaQsw6MlaD'
+        assert headers['/three'] == BASE_HEADERS
+
+    def test_requests_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def send(url, data, **kwargs):
+            barrier.wait()
+            return TestF5CloudServicesHttpApi._connection_response({'url': url})
+
+        self.connection_mock.send.side_effect = send
+
+        resp = self.f5cs_plugin.send_requests([dict(url='/{0}'.format(x)) for x in range(3)], max_workers=3)
+
+        assert [r['code'] for r in resp] == [200, 200, 200]
+
+    def test_errors_are_returned_per_request(self):
+        def send(url, data, **kwargs):
+            if url == '/missing':
+                raise HTTPError('http://f5cs.com', 404, '', {}, StringIO('{"errorMessage": "ERROR"}'))
+            if url == '/broken':
+                raise AnsibleConnectionFailure('Could not connect to foo: timed out')
+            return TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+
+        self.connection_mock.send.side_effect = send
+
+        resp = self.f5cs_plugin.send_requests([
+            dict(url='/missing'), dict(url='/broken'), dict(url='/ok')
+        ])
+
+        assert resp == [
+            dict(code=404, contents={'errorMessage': 'ERROR'}),
+            dict(code=None, contents='Could not connect to foo: timed out'),
+            dict(code=200, contents={'FOO': 'BAR'}),
+        ]
+
+    def test_unsupported_method_raises(self):
+        with self.assertRaises(ConnectionError):
+            self.f5cs_plugin.send_requests([dict(method='TRACE', url='/one')])
+        assert self.connection_mock.send.call_count == 0
+
+    def test_expired_token_is_refreshed_once(self):
+        self.f5cs_plugin.access_token = 'OLDTOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.f5cs_plugin.token_expires_at = time.time() - 1
+
+        def send(url, data, **kwargs):
+            if url == RELOG_URL:
+                time.sleep(0.05)
+                return TestF5CloudServicesHttpApi._connection_response({'access_token': 'NEWTOKEN', 'expires_at': '3600'})
+            return TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+
+        self.connection_mock.send.side_effect = send
+
+        self.f5cs_plugin.send_requests([dict(url='/{0}'.format(x)) for x in range(4)])
+
+        urls = [c[0][0] for c in self.connection_mock.send.call_args_list]
+        assert urls.count(RELOG_URL) == 1
+
+
+class TestF5CloudServicesCompression(TestCase):
+    def setUp(self):
+        self.connection_mock = Mock()
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+        self.f5cs_plugin.set_option('compression', True)
+        self.f5cs_plugin.set_option('compression_threshold', 100)
+
+    def test_large_request_body_is_compressed(self):
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+        payload = {'declaration': [{'application': {'name': 'app{0}'.format(x)}} for x in range(50)]}
+
+        self.f5cs_plugin.post('/beacon/v1/declare', data=payload, account_id='a-aaQsw6MlaD')
+
+        args, kwargs = self.connection_mock.send.call_args
+        assert json.loads(gzip.decompress(args[1])) == payload
+        assert kwargs['headers'] == {
+            'X-F5aaS-Preferred-Account-Id': 'a-aaQsw6MlaD',
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Accept-Encoding': 'gzip',
+        }
+        assert 'Content-Encoding' not in BASE_HEADERS
+        logs = [c[0][0] for c in self.connection_mock._log_messages.call_args_list]
+        assert any('request body compressed from {0} to {1} bytes'.format(
+            len(json.dumps(payload)), len(args[1])) in x for x in logs)
+
+    def test_small_request_body_is_not_compressed(self):
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+
+        self.f5cs_plugin.post('/testlink', data={'Test': 'Payload'})
+
+        self.connection_mock.send.assert_called_once_with(
+            '/testlink', '{"Test": "Payload"}', headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'},
+            method='POST'
+        )
+
+    def test_compressed_response_is_decompressed(self):
+        response_mock = Mock()
+        response_mock.getcode.return_value = 200
+        contents = {'sources': [{'name': 'source{0}'.format(x)} for x in range(50)]}
+        self.connection_mock.send.return_value = response_mock, BytesIO(gzip.compress(json.dumps(contents).encode()))
+
+        resp = self.f5cs_plugin.get('/beacon/v1/sources')
+
+        assert resp == dict(code=200, contents=contents)
+
+    def test_compressed_error_response_is_decompressed(self):
+        self.connection_mock.send.side_effect = HTTPError(
+            'http://f5cs.com', 404, '', {}, BytesIO(gzip.compress(b'{"errorMessage": "ERROR"}'))
+        )
+
+        resp = self.f5cs_plugin.get('/beacon/v1/sources')
+
+        assert resp == dict(code=404, contents={'errorMessage': 'ERROR'})
+
+
+class TestF5CloudServicesLogging(TestCase):
+    def setUp(self):
+        self.connection_options = dict(persistent_log_messages=True)
+        self.connection_mock = Mock()
+        self.connection_mock._url = 'https://api.cloudservices.f5.com:443'
+        self.connection_mock.get_option.side_effect = lambda x: self.connection_options[x]
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+
+    def _logs(self):
+        return [c[0][0] for c in self.connection_mock._log_messages.call_args_list]
+
+    def test_nothing_is_built_when_logging_is_disabled(self):
+        self.connection_options['persistent_log_messages'] = False
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+
+        with patch.object(self.f5cs_plugin, '_body_preview') as preview_mock:
+            self.f5cs_plugin.post('/testlink', data={'Test': 'Payload'})
+
+        assert preview_mock.call_count == 0
+        assert self.connection_mock._log_messages.call_count == 0
+
+    def test_credentials_are_redacted(self):
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response(
+            {'access_token': 'TOKENDATA', 'refresh_token': 'REFRESHDATA', 'expires_at': '3600'}
+        )
+
+        self.f5cs_plugin.login('foo', 'secret')
+        self.f5cs_plugin.refresh_token = 'REFRESH\\"DATA'
+        self.f5cs_plugin._refresh_token()
+
+        logs = '\n'.join(self._logs())
+        assert 'secret' not in logs
+        assert 'REFRESH' not in logs
+        assert '"password": "********"' in logs
+        assert '"refresh_token": "********"' in logs
+        assert 'https://api.cloudservices.f5.com:443/v1/svc-auth/login' in logs
+
+    def test_body_is_truncated(self):
+        self.f5cs_plugin.set_option('log_body_size', 34)
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+        payload = {'name': 'foo', 'password': 'secretsecret', 'description': 'x' * 100}
+
+        self.f5cs_plugin.post('/testlink', data=payload)
+
+        data = json.dumps(payload)
+        assert self._logs()[0].endswith(
+            'with data {{"name": "foo", "password": "********"... <{0} bytes>'.format(len(data))
+        )
+        assert 'secret' not in self._logs()[0]
+
+    def test_body_is_omitted(self):
+        self.f5cs_plugin.set_option('log_body_size', 0)
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+
+        self.f5cs_plugin.post('/testlink', data={'Test': 'Payload'})
+
+        assert self._logs()[0].endswith('with data <19 bytes>')
+
+    def test_responses_are_logged_when_enabled(self):
+        self.connection_mock.send.side_effect = [
+            TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'}),
+            TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'}),
+            HTTPError('http://f5cs.com', 404, '', {}, StringIO('{"errorMessage": "ERROR"}')),
+        ]
+
+        self.f5cs_plugin.get('/testlink')
+        self.f5cs_plugin.set_option('log_responses', True)
+        self.f5cs_plugin.get('/testlink')
+        self.f5cs_plugin.get('/missing')
+
+        logs = [x for x in self._logs() if 'returned' in x]
+        assert len(logs) == 2
+        assert re.search(r'GET /testlink returned 200 in \d+\.\d{3}s with 14 bytes$', logs[0])
+        assert re.search(r'GET /missing returned 404 in \d+\.\d{3}s with 25 bytes$', logs[1])
+
+
+class TestF5CloudServicesMetrics(TestCase):
+    def setUp(self):
+        self.connection_mock = Mock()
+        self.connection_mock._url = 'https://api.cloudservices.f5.com:443'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+
+    def test_requests_are_recorded_per_endpoint(self):
+        self.connection_mock.send.side_effect = [
+            TestF5CloudServicesHttpApi._connection_response({'name': 'foo'}),
+            HTTPError('http://f5cs.com', 404, '', {}, StringIO('{"errorMessage": "ERROR"}')),
+            TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'}),
+            AnsibleConnectionFailure('Could not connect to foo: timed out'),
+        ]
+
+        self.f5cs_plugin.get('/beacon/v1/telemetry-token/foo')
+        self.f5cs_plugin.get('/beacon/v1/telemetry-token/bar')
+        self.f5cs_plugin.post('/beacon/v1/telemetry-token', data={'name': 'foo'})
+        with self.assertRaises(AnsibleConnectionFailure):
+            self.f5cs_plugin.get('/beacon/v1/sources')
+
+        metrics = self.f5cs_plugin.get_metrics()
+
+        assert metrics['calls'] == 4
+        endpoint = metrics['endpoints']['GET /beacon/v1/telemetry-token/{name}']
+        assert endpoint['count'] == 2
+        assert endpoint['status'] == {'200': 1, '404': 1}
+        assert endpoint['bytes_received'] == len('{"name": "foo"}') + len('{"errorMessage": "ERROR"}')
+        assert metrics['endpoints']['POST /beacon/v1/telemetry-token']['bytes_sent'] == len('{"name": "foo"}')
+        assert metrics['endpoints']['GET /beacon/v1/sources']['status'] == {'error': 1}
+
+    def test_metrics_are_dumped_on_logout(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'metrics.json')
+            self.f5cs_plugin.set_option('metrics_file', path)
+            self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({})
+            self.f5cs_plugin.access_token = 'TOKEN'
+
+            self.f5cs_plugin.get('/beacon/v1/sources')
+            self.f5cs_plugin.logout()
+
+            with open(path) as f:
+                metrics = json.load(f)
+            assert metrics['endpoints']['GET /beacon/v1/sources']['count'] == 1
+            assert metrics['endpoints']['POST /v1/svc-auth/logout']['count'] == 1
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestF5CloudServicesTokenCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.connection_mock = Mock()
+        self.connection_mock._url = 'https://api.cloudservices.f5.com:443'
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+        self.f5cs_plugin.set_option('token_cache', self.tmpdir)
+        self.f5cs_plugin.set_option('purge_token_cache', False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_login_stores_token_in_cache(self):
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response(
+            {'access_token': 'TOKENDATA', 'refresh_token': 'REFRESHDATA', 'expires_at': '3600'}
+        )
+
+        self.f5cs_plugin.login('foo', 'bar')
+
+        entry = TokenCache(self.tmpdir, self.connection_mock._url, 'foo').read()
+        assert entry['access_token'] == 'TOKENDATA'
+        assert entry['refresh_token'] == 'REFRESHDATA'
+        assert entry['expires_at'] == self.f5cs_plugin.token_expires_at
+
+    def test_login_reuses_cached_token(self):
+        TokenCache(self.tmpdir, self.connection_mock._url, 'foo').write('CACHED', 'REFRESHDATA', time.time() + 3600)
+
+        self.f5cs_plugin.login('foo', 'bar')
+
+        assert self.connection_mock.send.call_count == 0
+        assert self.f5cs_plugin.access_token == 'CACHED'
+        assert self.connection_mock._auth == {'Authorization': 'Bearer CACHED'}
+
+    def test_login_ignores_cached_token_close_to_expiry(self):
+        TokenCache(self.tmpdir, self.connection_mock._url, 'foo').write('CACHED', 'REFRESHDATA', time.time() + 10)
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response(
+            {'access_token': 'TOKENDATA', 'refresh_token': 'REFRESHDATA', 'expires_at': '3600'}
+        )
+
+        self.f5cs_plugin.login('foo', 'bar')
+
+        assert self.connection_mock.send.call_args[0][0] == LOGIN_URL
+        assert self.f5cs_plugin.access_token == 'TOKENDATA'
+
+    def test_refresh_reuses_token_refreshed_by_another_process(self):
+        self.f5cs_plugin.username = 'foo'
+        self.f5cs_plugin.access_token = 'OLDTOKEN'
+        self.f5cs_plugin.refresh_token = 'REFRESHDATA'
+        self.f5cs_plugin.token_expires_at = time.time() - 1
+        TokenCache(self.tmpdir, self.connection_mock._url, 'foo').write('NEWTOKEN', 'REFRESHDATA', time.time() + 3600)
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({'FOO': 'BAR'})
+
+        self.f5cs_plugin.get('/testlink')
+
+        self.connection_mock.send.assert_called_once_with('/testlink', None, method='GET', headers=BASE_HEADERS)
+        assert self.f5cs_plugin.access_token == 'NEWTOKEN'
+
+    def test_logout_keeps_cached_token(self):
+        TokenCache(self.tmpdir, self.connection_mock._url, 'foo').write('CACHED', 'REFRESHDATA', time.time() + 3600)
+        self.f5cs_plugin.login('foo', 'bar')
+
+        self.f5cs_plugin.logout()
+
+        assert self.connection_mock.send.call_count == 0
+        assert TokenCache(self.tmpdir, self.connection_mock._url, 'foo').read() is not None
+
+    def test_logout_purges_cached_token_when_requested(self):
+        self.f5cs_plugin.set_option('purge_token_cache', True)
+        TokenCache(self.tmpdir, self.connection_mock._url, 'foo').write('CACHED', 'REFRESHDATA', time.time() + 3600)
+        self.f5cs_plugin.login('foo', 'bar')
+        self.connection_mock.send.return_value = TestF5CloudServicesHttpApi._connection_response({})
+
+        self.f5cs_plugin.logout()
+
+        assert self.connection_mock.send.call_args[0][0] == LOGOUT_URL
+        assert TokenCache(self.tmpdir, self.connection_mock._url, 'foo').read() is None
+
+
+class TestF5CloudServicesConnectionPool(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        cert_file, key_file = create_self_signed_cert(self.tmpdir)
+        self.server = StandInServer(cert_file, key_file).start()
+        connection_options = dict(validate_certs=True, ca_path=cert_file, use_proxy=False)
+        self.connection_mock = Mock()
+        self.connection_mock._url = self.server.url
+        self.connection_mock._auth = {'Authorization': 'Bearer TOKEN'}
+        self.connection_mock.get_option.side_effect = lambda x: connection_options[x]
+        self.f5cs_plugin = httpapi_plugin(self.connection_mock, json_backend='json')
+        self.f5cs_plugin.set_option('connection_pool', True)
+        self.f5cs_plugin.set_option('connection_pool_size', 2)
+
+    def tearDown(self):
+        self.f5cs_plugin.connection_pool.close()
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_requests_are_sent_over_pool(self):
+        self.server.responses.append((200, {'FOO': 'BAR'}))
+
+        for x in range(3):
+            resp = self.f5cs_plugin.get('/testlink', account_id='a-aaQsw6MlaD')
+
+        assert resp == dict(code=200, contents={'status': 'ok'})
+        assert self.connection_mock.send.call_count == 0
+        assert self.server.connections == 1
+        headers = self.server.requests[0]['headers']
+        assert headers['Authorization'] == 'Bearer TOKEN'
+        assert headers['X-F5aaS-Preferred-Account-Id'] == 'a-aaQsw6MlaD'
+        assert headers['Content-Type'] == 'application/json'
+
+    def test_client_error_is_returned_to_caller(self):
+        self.server.responses.append((404, {'errorMessage': 'ERROR'}))
+
+        resp = self.f5cs_plugin.get('/testlink')
+
+        assert resp == dict(code=404, contents={'errorMessage': 'ERROR'})
+
+    def test_server_error_raises_connection_failure(self):
+        self.f5cs_plugin.set_option('retries', 0)
+        self.server.responses.append((503, {'errorMessage': 'ERROR'}))
+
+        with self.assertRaises(AnsibleConnectionFailure):
+            self.f5cs_plugin.get('/testlink')
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from unittest import TestCase
+from unittest.mock import patch
+
+try:
+    from plugins.plugin_utils.fact_cache import FactCache
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.fact_cache import FactCache
+
+
+class TestFactCache(TestCase):
+    def test_store_and_get(self):
+        cache = FactCache(4)
+        cache.store('tokens', {'tokens': []}, 60, 'a-aaQsw6MlaD')
+
+        assert cache.get('tokens', 'a-aaQsw6MlaD') == {'tokens': []}
+        assert cache.get('tokens') is None
+        assert cache.get('sources', 'a-aaQsw6MlaD') is None
+
+    def test_entries_expire(self):
+        cache = FactCache(4)
+        with patch('time.time', return_value=1000):
+            cache.store('tokens', {'tokens': []}, 60)
+        with patch('time.time', return_value=1059):
+            assert cache.get('tokens') == {'tokens': []}
+        with patch('time.time', return_value=1060):
+            assert cache.get('tokens') is None
+        assert len(cache) == 0
+
+    def test_zero_ttl_is_not_stored(self):
+        cache = FactCache(4)
+        cache.store('tokens', {'tokens': []}, 0)
+
+        assert len(cache) == 0
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = FactCache(2)
+        cache.store('tokens', 1, 60)
+        cache.store('sources', 2, 60)
+        cache.get('tokens')
+        cache.store('all', 3, 60)
+
+        assert cache.get('tokens') == 1
+        assert cache.get('sources') is None
+        assert cache.get('all') == 3
+
+    def test_invalidate_account(self):
+        cache = FactCache(4)
+        cache.store('tokens', 1, 60, 'a-aaQsw6MlaD')
+        cache.store('tokens', 2, 60, 'a-aaBBBBBBBB')
+        cache.store('tokens', 3, 60)
+
+        cache.invalidate('a-aaQsw6MlaD')
+
+        assert cache.get('tokens', 'a-aaQsw6MlaD') is None
+        assert cache.get('tokens', 'a-aaBBBBBBBB') == 2
+        assert cache.get('tokens') is None
+
+        cache.invalidate()
+        assert len(cache) == 0
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+
+from unittest import TestCase
+
+try:
+    from plugins.plugin_utils.json_backend import BACKENDS
+    from plugins.plugin_utils.json_backend import get_json_backend
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.json_backend import BACKENDS
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.json_backend import get_json_backend
+
+
+INSTALLED = [name for name, (library, backend) in BACKENDS.items() if library is not None]
+
+
+class TestJsonBackend(TestCase):
+    def test_roundtrip_with_installed_backends(self):
+        payload = {'declaration': [{'application': {'name': u'appé', 'labels': {}, 'dependencies': []}}]}
+        for name in INSTALLED:
+            backend = get_json_backend(name)
+            data = backend.dumps(payload)
+
+            assert json.loads(data) == payload
+            assert backend.loads(data) == payload
+            assert backend.loads(memoryview(data if isinstance(data, bytes) else data.encode())) == payload
+
+    def test_unsupported_values_fall_back_to_standard_library(self):
+        payload = {'count': 2 ** 70}
+        for name in INSTALLED:
+            assert json.loads(get_json_backend(name).dumps(payload)) == payload
+
+    def test_invalid_document_raises_value_error(self):
+        for name in INSTALLED:
+            with self.assertRaises(ValueError):
+                get_json_backend(name).loads(b'{"sources": ')
+
+    def test_auto_picks_fastest_installed_backend(self):
+        expected = [x for x in ('orjson', 'ujson', 'json') if x in INSTALLED][0]
+
+        assert get_json_backend('auto').name == expected
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            get_json_backend('yaml')
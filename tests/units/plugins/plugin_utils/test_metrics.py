@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+try:
+    from plugins.plugin_utils.metrics import RequestMetrics
+    from plugins.plugin_utils.metrics import normalize_url
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.metrics import RequestMetrics
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.metrics import normalize_url
+
+
+class TestNormalizeUrl(TestCase):
+    def test_collection_urls_are_kept(self):
+        assert normalize_url('/beacon/v1/sources') == '/beacon/v1/sources'
+        assert normalize_url('/beacon/v1/sources?limit=100&offset=200') == '/beacon/v1/sources'
+
+    def test_token_names_are_replaced(self):
+        assert normalize_url('/beacon/v1/telemetry-token/foo_token') == '/beacon/v1/telemetry-token/{name}'
+
+    def test_ids_are_replaced(self):
+        assert normalize_url('/beacon/v1/task/244916') == '/beacon/v1/task/{id}'
+        assert normalize_url(
+            '/beacon/v1/task/4a1c2bd0-57fb-4b5e-9b0e-3c0d8f1e2a3b/status'
+        ) == '/beacon/v1/task/{id}/status'
+        assert normalize_url('/v1/svc-account/accounts/a-aaQsw6MlaD') == '/v1/svc-account/accounts/{id}'
+
+
+class TestRequestMetrics(TestCase):
+    def test_record_and_snapshot(self):
+        metrics = RequestMetrics()
+        metrics.record('GET', '/beacon/v1/telemetry-token/foo', 200, 0.020, 0, 100)
+        metrics.record('GET', '/beacon/v1/telemetry-token/bar', 404, 0.300, 0, 50)
+        metrics.record('POST', '/beacon/v1/telemetry-token', 200, 12.0, 40, 10)
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot['calls'] == 3
+        endpoint = snapshot['endpoints']['GET /beacon/v1/telemetry-token/{name}']
+        assert endpoint['count'] == 2
+        assert endpoint['bytes_received'] == 150
+        assert endpoint['status'] == {'200': 1, '404': 1}
+        assert endpoint['latency']['min'] == 0.020
+        assert endpoint['latency']['max'] == 0.300
+        assert abs(endpoint['latency']['mean'] - 0.160) < 1e-9
+        assert endpoint['latency']['histogram']['25'] == 1
+        assert endpoint['latency']['histogram']['500'] == 1
+        endpoint = snapshot['endpoints']['POST /beacon/v1/telemetry-token']
+        assert endpoint['bytes_sent'] == 40
+        assert endpoint['latency']['histogram']['+Inf'] == 1
+
+    def test_snapshot_reset(self):
+        metrics = RequestMetrics()
+        metrics.record('GET', '/beacon/v1/sources', 200, 0.1)
+
+        assert metrics.snapshot(reset=True)['calls'] == 1
+        assert metrics.snapshot()['calls'] == 0
+
+    def test_dump(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            metrics = RequestMetrics()
+            metrics.record('GET', '/beacon/v1/sources', 200, 0.1, 0, 10)
+            path = os.path.join(tmpdir, 'metrics.json')
+
+            metrics.dump(path)
+
+            with open(path) as f:
+                assert json.load(f)['endpoints']['GET /beacon/v1/sources']['bytes_received'] == 10
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from unittest import TestCase
+
+try:
+    from plugins.plugin_utils.response_cache import ResponseCache
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.response_cache import ResponseCache
+
+
+class TestResponseCache(TestCase):
+    def test_store_and_get_entry(self):
+        cache = ResponseCache(4)
+        cache.store('/beacon/v1/sources', 'a-aaQsw6MlaD', {'ETag': '"abc"'}, {'sources': []})
+
+        entry = cache.get('/beacon/v1/sources', 'a-aaQsw6MlaD')
+
+        assert entry['contents'] == {'sources': []}
+        assert cache.validators(entry) == {'If-None-Match': '"abc"'}
+        assert cache.get('/beacon/v1/sources') is None
+
+    def test_responses_without_validators_are_not_stored(self):
+        cache = ResponseCache(4)
+        cache.store('/beacon/v1/sources', None, {'Content-Type': 'application/json'}, {'sources': []})
+
+        assert len(cache) == 0
+
+    def test_last_modified_validator(self):
+        cache = ResponseCache(4)
+        cache.store('/beacon/v1/sources', None, {'Last-Modified': 'Wed, 21 Oct 2020 07:28:00 GMT'}, {})
+
+        entry = cache.get('/beacon/v1/sources')
+
+        assert cache.validators(entry) == {'If-Modified-Since': 'Wed, 21 Oct 2020 07:28:00 GMT'}
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(2)
+        cache.store('/one', None, {'ETag': '"1"'}, {})
+        cache.store('/two', None, {'ETag': '"2"'}, {})
+        cache.get('/one')
+        cache.store('/three', None, {'ETag': '"3"'}, {})
+
+        assert cache.get('/one') is not None
+        assert cache.get('/two') is None
+        assert cache.get('/three') is not None
+
+    def test_invalidate_related_resources(self):
+        cache = ResponseCache(8)
+        cache.store('/beacon/v1/telemetry-token', 'a-1', {'ETag': '"1"'}, {})
+        cache.store('/beacon/v1/telemetry-token', 'a-2', {'ETag': '"1"'}, {})
+        cache.store('/beacon/v1/telemetry-token/foo', None, {'ETag': '"2"'}, {})
+        cache.store('/beacon/v1/telemetry-token/bar', None, {'ETag': '"3"'}, {})
+        cache.store('/beacon/v1/telemetry-tokens', None, {'ETag': '"4"'}, {})
+        cache.store('/beacon/v1/sources', None, {'ETag': '"5"'}, {})
+
+        cache.invalidate('/beacon/v1/telemetry-token/foo')
+
+        assert cache.get('/beacon/v1/telemetry-token', 'a-1') is None
+        assert cache.get('/beacon/v1/telemetry-token', 'a-2') is None
+        assert cache.get('/beacon/v1/telemetry-token/foo') is None
+        assert cache.get('/beacon/v1/telemetry-token/bar') is not None
+        assert cache.get('/beacon/v1/telemetry-tokens') is not None
+        assert cache.get('/beacon/v1/sources') is not None
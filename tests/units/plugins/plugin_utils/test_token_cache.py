@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+from unittest import TestCase
+
+try:
+    from plugins.plugin_utils.token_cache import TokenCache
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.token_cache import TokenCache
+
+
+class TestTokenCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tokens')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_write_and_read_entry(self):
+        cache = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'foo')
+        expires_at = time.time() + 3600
+        cache.write('TOKEN', 'REFRESH', expires_at)
+
+        entry = cache.read()
+
+        assert entry == dict(access_token='TOKEN', refresh_token='REFRESH', expires_at=expires_at)
+
+    def test_cache_is_owner_only(self):
+        cache = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'foo')
+        cache.write('TOKEN', 'REFRESH', time.time() + 3600)
+
+        assert stat.S_IMODE(os.stat(self.path).st_mode) == 0o700
+        assert stat.S_IMODE(os.stat(cache.filename).st_mode) == 0o600
+
+    def test_entries_are_keyed_by_url_and_username(self):
+        cache1 = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'foo')
+        cache2 = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'bar')
+        cache3 = TokenCache(self.path, 'https://other.f5.com:443', 'foo')
+        cache1.write('TOKEN', 'REFRESH', time.time() + 3600)
+
+        assert cache1.read() is not None
+        assert cache2.read() is None
+        assert cache3.read() is None
+
+    def test_expired_entry_is_not_returned(self):
+        cache = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'foo')
+        cache.write('TOKEN', 'REFRESH', time.time() + 30)
+
+        assert cache.read() is not None
+        assert cache.read(margin=60) is None
+
+    def test_corrupted_entry_is_not_returned(self):
+        cache = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'foo')
+        cache.write('TOKEN', 'REFRESH', time.time() + 3600)
+        with open(cache.filename, 'w') as f:
+            f.write('{"access_token": ')
+
+        assert cache.read() is None
+
+    def test_delete_entry(self):
+        cache = TokenCache(self.path, 'https://api.cloudservices.f5.com:443', 'foo')
+        cache.write('TOKEN', 'REFRESH', time.time() + 3600)
+        cache.delete()
+        cache.delete()
+
+        assert cache.read() is None
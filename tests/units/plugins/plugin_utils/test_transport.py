@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: (c) 2020, F5 Networks Inc.
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import errno
+import json
+import shutil
+import socket
+import tempfile
+
+from unittest import TestCase
+
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.error import URLError
+
+try:
+    from plugins.plugin_utils.transport import ConnectionPool
+    from plugins.plugin_utils.transport import is_stale_connection_error
+    from tests.units.common.server import StandInServer
+    from tests.units.common.server import create_self_signed_cert
+except ImportError:
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.transport import ConnectionPool
+    from ansible_collections.f5networks.f5_beacon.plugins.plugin_utils.transport import is_stale_connection_error
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.server import StandInServer
+    from ansible_collections.f5networks.f5_beacon.tests.units.common.server import create_self_signed_cert
+
+
+class TestStaleConnectionError(TestCase):
+    def test_closed_connection_errors(self):
+        assert is_stale_connection_error(http_client.BadStatusLine(''))
+        assert is_stale_connection_error(socket.error(errno.EPIPE, 'Broken pipe'))
+        assert is_stale_connection_error(socket.error(errno.ECONNRESET, 'Connection reset by peer'))
+
+    def test_other_errors(self):
+        assert not is_stale_connection_error(socket.error(errno.ECONNREFUSED, 'Connection refused'))
+        assert not is_stale_connection_error(socket.timeout('timed out'))
+        assert not is_stale_connection_error(ValueError('foo'))
+
+
+class TestConnectionPool(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.cert_file, cls.key_file = create_self_signed_cert(cls.tmpdir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        self.server = StandInServer(self.cert_file, self.key_file).start()
+        self.pool = ConnectionPool(self.server.url, ca_path=self.cert_file, use_proxy=False)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+    def test_requests_reuse_connection(self):
+        for x in range(5):
+            response, response_data = self.pool.send('/beacon/v1/sources', method='GET')
+            assert response.getcode() == 200
+            assert json.loads(response_data.getvalue()) == {'status': 'ok'}
+
+        assert self.pool.connections_opened == 1
+        assert self.server.connections == 1
+
+    def test_headers_and_body_are_sent(self):
+        self.pool.send(
+            '/beacon/v1/declare', data='{"action": "get"}', method='POST',
+            headers={'Content-Type': 'application/json', 'Authorization': 'Bearer TOKEN'}
+        )
+
+        request = self.server.requests[0]
+        assert request['method'] == 'POST'
+        assert request['path'] == '/beacon/v1/declare'
+        assert request['headers']['Authorization'] == 'Bearer TOKEN'
+        assert request['headers']['Content-Type'] == 'application/json'
+        assert request['body'] == b'{"action": "get"}'
+
+    def test_error_status_raises_http_error(self):
+        self.server.responses.append((404, {'errorMessage': 'not found'}))
+
+        with self.assertRaises(HTTPError) as res:
+            self.pool.send('/beacon/v1/telemetry-token/foo', method='GET')
+
+        assert res.exception.code == 404
+        assert json.loads(res.exception.read()) == {'errorMessage': 'not found'}
+        response, response_data = self.pool.send('/beacon/v1/telemetry-token', method='GET')
+        assert self.pool.connections_opened == 1
+
+    def test_stale_connection_is_replaced(self):
+        self.pool.send('/beacon/v1/sources', method='GET')
+        for conn in self.pool._idle:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+
+        response, response_data = self.pool.send('/beacon/v1/sources', method='GET')
+
+        assert response.getcode() == 200
+        assert self.pool.connections_opened == 2
+
+    def test_stale_connection_does_not_resend_post(self):
+        self.pool.send('/beacon/v1/sources', method='GET')
+        for conn in self.pool._idle:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+
+        with self.assertRaises(URLError):
+            self.pool.send('/beacon/v1/declare', data='{"action": "deploy"}', method='POST')
+
+        assert self.pool.connections_opened == 1
+
+    def test_new_connections_resume_tls_session(self):
+        self.pool.send('/beacon/v1/sources', method='GET')
+        self.pool.close()
+
+        self.pool.send('/beacon/v1/sources', method='GET')
+
+        assert self.pool.connections_opened == 2
+        assert self.pool._idle[0].sock.session_reused is True
+
+    def test_certificate_is_validated(self):
+        pool = ConnectionPool(self.server.url, use_proxy=False)
+
+        with self.assertRaises(URLError):
+            pool.send('/beacon/v1/sources', method='GET')
+
+        pool = ConnectionPool(self.server.url, validate_certs=False, use_proxy=False)
+        response, response_data = pool.send('/beacon/v1/sources', method='GET')
+        assert response.getcode() == 200
+        pool.close()